@@ -0,0 +1,105 @@
+# answer_cache.py
+import threading
+import numpy as np
+from utils.lru_cache import LRUCache
+from metrics import metrics
+
+# ✅ Cache settings
+ANSWER_CACHE_SIZE = 256           # answers kept in memory
+ANSWER_CACHE_TTL = 6 * 60 * 60    # seconds
+SIMILARITY_THRESHOLD = 0.95       # cosine similarity for near-duplicate questions
+
+
+def _normalize(embedding):
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class AnswerCache:
+    """
+    Generated answers keyed on model tag, prompt variant, the question (case and spacing
+    normalized) and the retrieved chunk ids.
+
+    A second lookup path matches near-duplicate questions on their query embedding,
+    skipping retrieval too. Entries are dropped as soon as one of their chunks is
+    re-ingested, and the near-duplicate path ignores answers created before the
+    latest ingestion.
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL, threshold=SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self._entries = LRUCache(max_entries, ttl)
+        self._by_chunk = {}  # chunk id -> cache keys using it, for invalidation
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model_tag, variant, question, chunk_ids):
+        # Different questions may retrieve the same chunks; only the same question reuses the answer
+        return (model_tag, variant, " ".join(question.lower().split()), tuple(chunk_ids))
+
+    def _count(self, entry):
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def lookup(self, model_tag, variant, query_embedding):
+        """Returns the cached answer of the most similar earlier question, if close enough."""
+        query = _normalize(query_embedding)
+        best, best_score = None, self.threshold
+        for (tag, entry_variant, _, _), entry in self._entries.items():
+            if tag != model_tag or entry_variant != variant or entry["generation"] != self._generation:
+                continue
+            score = float(np.dot(query, entry["embedding"]))
+            if score >= best_score:
+                best, best_score = entry, score
+        if best is not None:
+            self._count(best)
+        return best
+
+    def get(self, model_tag, variant, question, chunk_ids):
+        # Counts a miss too: call after lookup() found nothing
+        return self._count(self._entries.get(self.key(model_tag, variant, question, chunk_ids)))
+
+    def put(self, model_tag, variant, question, chunk_ids, query_embedding, **values):
+        key = self.key(model_tag, variant, question, chunk_ids)
+        entry = dict(values, chunk_ids=list(chunk_ids), embedding=_normalize(query_embedding),
+                     generation=self._generation)
+        self._entries.put(key, entry)
+        with self._lock:
+            for chunk_id in chunk_ids:
+                self._by_chunk.setdefault(chunk_id, set()).add(key)
+            if len(self._by_chunk) > self._entries.max_entries * 20:
+                self._prune()
+
+    def _prune(self):
+        # Forget chunk ids that only belonged to evicted entries
+        live = {}
+        for key, entry in self._entries.items():
+            for chunk_id in entry["chunk_ids"]:
+                live.setdefault(chunk_id, set()).add(key)
+        self._by_chunk = live
+
+    def invalidate(self, chunk_ids):
+        with self._lock:
+            self._generation += 1
+            keys = set()
+            for chunk_id in chunk_ids:
+                keys |= self._by_chunk.pop(chunk_id, set())
+        for key in keys:
+            self._entries.pop(key)
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+answer_cache = AnswerCache()
+metrics.register_gauge("answer_cache", lambda: {"hits": answer_cache.hits, "misses": answer_cache.misses,
+                                                "hit_rate": answer_cache.hit_rate()})
@@ -1,35 +1,82 @@
+import time
+_started = time.perf_counter()
+
 import gradio as gr
-import json
-from retriever import (
-    ingest_files, ask_question, save_answer_to_file,
-    show_chunk_stats, export_answer_to_pdf, suggest_questions
-)
+from resources import get_glossary, warm_up, record_timing, startup_report, list_libraries, DEFAULT_LIBRARY
+from retriever import ask_question, show_chunk_stats, suggest_questions
+from exports import exporter, EXPORT_FORMATS
+from ingest_jobs import ingest_jobs, format_job_status
+from history_store import format_entries, HISTORY_PAGE_SIZE
+from metrics import serve_metrics
+
+record_timing("imports", time.perf_counter() - _started)
 
-# ✅ Global glossary dictionary
-glossary = {}
+# ✅ Concurrency: retrieval runs in parallel, generation is bounded per model by the Ollama client
+QUEUE_CONCURRENCY = 16      # default workers per event
+QUEUE_MAX_SIZE = 256        # pending requests before new ones are rejected
+LLM_EVENT_CONCURRENCY = 8   # answer/suggest handlers in flight at once
 
-# ✅ Glossary preview function
+# ✅ Glossary preview function (shared glossary, loaded on first use)
 def show_glossary():
-    return json.dumps(glossary, indent=2, ensure_ascii=False)
+    return get_glossary().to_json()
+
+# ✅ Upload handler: runs as a background job and streams its progress (chunk stats are per session)
+def handle_upload(files, library, file_stats):
+    file_stats = dict(file_stats or {})
+    if not files:
+        yield "⚠️ No files selected.", show_chunk_stats(file_stats), file_stats, None
+        return
+    try:
+        job_id = ingest_jobs.submit([file.name for file in files], library)
+    except ValueError as e:
+        yield f"⚠️ {e}", show_chunk_stats(file_stats), file_stats, None
+        return
+    for job in ingest_jobs.watch(job_id):
+        if job:
+            file_stats.update(job["progress"]["file_stats"])
+        yield format_job_status(job), show_chunk_stats(file_stats), file_stats, job_id
 
-# ✅ Upload handler
-def handle_upload(files):
-    status = ingest_files(files)
-    stats = show_chunk_stats()
-    return status, stats
+def handle_cancel(job_id):
+    if not job_id:
+        return "⚠️ No ingest job is running."
+    return format_job_status(ingest_jobs.cancel(job_id))
 
-# ✅ Export handler
+# ✅ Question handler with the library / file type scope picked in the UI (history is per session)
+def handle_ask(query, show_chunks, model_name, show_explanation, libraries, file_types, session_history):
+    for outputs in ask_question(query, show_chunks, model_name, show_explanation,
+                                filters={"libraries": libraries, "file_types": file_types},
+                                session_history=session_history):
+        yield *outputs, session_history, 0
+
+# ✅ Export handlers (rendered on the export pool; the UI shows progress meanwhile)
 def handle_export(format, question, answer, context, model_name, include_citations):
+    yield None, "⏳ Exporting..."
     try:
         context_text = context if isinstance(context, str) else context.value
         sources = "DocSmith Embedded Chunks"
         if format == "PDF":
-            return export_answer_to_pdf(question, answer, context_text, sources, model_name, include_citations)
+            job = exporter.submit(exporter.answer_pdf, question, answer, context_text, sources, model_name, include_citations)
         else:
-            return save_answer_to_file(answer, sources if include_citations else None)
+            job = exporter.submit(exporter.answer_txt, answer, sources if include_citations else None)
+        for seconds in exporter.watch(job):
+            yield None, f"⏳ Exporting... {seconds:.0f}s"
+        yield job.result(), "✅ Export ready."
     except Exception as e:
         print(f"❌ Export failed: {str(e)}")
-        return None
+        yield None, f"❌ Export failed: {str(e)}"
+
+def handle_history_export(format, since, until, contains):
+    yield None, "⏳ Exporting history..."
+    try:
+        job = exporter.submit(exporter.history, format, since.strip() or None,
+                              until.strip() or None, contains.strip() or None)
+        for seconds in exporter.watch(job):
+            yield None, f"⏳ Exporting history... {seconds:.0f}s"
+        path, count = job.result()
+        yield path, f"✅ Exported {count} history entries."
+    except Exception as e:
+        print(f"❌ History export failed: {str(e)}")
+        yield None, f"❌ History export failed: {str(e)}"
 
 # ✅ Radio updater to avoid Gradio error
 def handle_suggestions(style):
@@ -39,14 +86,23 @@ def handle_suggestions(style):
 
 # ✅ Glossary auto-suggest logic
 def suggest_glossary_terms(query):
-    query = query.lower().strip()
-    matches = [term for term in glossary if query in term or term in query]
+    matches = get_glossary().index.suggest(query) if query.strip() else []
     return gr.update(choices=matches, visible=bool(matches))
 
-# ✅ Answer selected suggested question
-def answer_selected_question(q, show_chunks, model_name):
-    answer, overview, full_context, history = ask_question(q, show_chunks, model_name)
-    return q, answer, overview, full_context, history
+# ✅ History paging over this session's questions (page 0 = most recent)
+def show_history_page(page, session_history):
+    pages = max(1, -(-len(session_history) // HISTORY_PAGE_SIZE))
+    page = min(max(0, page), pages - 1)
+    end = len(session_history) - page * HISTORY_PAGE_SIZE
+    return format_entries(session_history[max(0, end - HISTORY_PAGE_SIZE):end]), page
+
+# ✅ Answer selected suggested question (streams like the main answer box)
+def answer_selected_question(q, show_chunks, model_name, session_history):
+    for answer, overview, full_context, history in ask_question(q, show_chunks, model_name,
+                                                                session_history=session_history):
+        yield q, answer, overview, full_context, history, session_history, 0
+
+_ui_started = time.perf_counter()
 
 with gr.Blocks(theme=gr.themes.Soft(primary_hue="blue")) as demo:
     demo.title = "DocMentor — Your AI mentor for every document"
@@ -55,15 +111,26 @@ with gr.Blocks(theme=gr.themes.Soft(primary_hue="blue")) as demo:
     with gr.Tab("📁 Upload & Embed"):
         with gr.Row():
             file_input = gr.File(file_types=[".txt", ".pdf", ".docx"], label="Upload Documents", file_count="multiple")
+            library_input = gr.Textbox(label="Library", value=DEFAULT_LIBRARY, placeholder="e.g. marketing-team")
             upload_btn = gr.Button("📥 Embed Documents")
+            cancel_btn = gr.Button("🛑 Cancel")
         with gr.Row():
             upload_output = gr.Textbox(label="Status", interactive=False)
             chunk_viewer = gr.Markdown(label="📊 Chunk Stats")
 
+        session_file_stats = gr.State({})
+        session_job = gr.State(None)
+
         upload_btn.click(
             fn=handle_upload,
-            inputs=[file_input],
-            outputs=[upload_output, chunk_viewer]
+            inputs=[file_input, library_input, session_file_stats],
+            outputs=[upload_output, chunk_viewer, session_file_stats, session_job]
+        )
+
+        cancel_btn.click(
+            fn=handle_cancel,
+            inputs=[session_job],
+            outputs=[upload_output]
         )
 
     with gr.Tab("🔍 Ask a Question"):
@@ -82,6 +149,17 @@ with gr.Blocks(theme=gr.themes.Soft(primary_hue="blue")) as demo:
             - 🧬 **Gemma-2B**: Advanced reasoning, ideal for abstract or multi-paragraph synthesis.
             """)
 
+        # ✅ Search scope: only the selected library shards are searched (all when none is selected)
+        with gr.Row():
+            library_filter = gr.Dropdown(label="Search in Libraries", choices=[], multiselect=True)
+            file_type_filter = gr.CheckboxGroup(label="File Types", choices=["pdf", "docx", "txt"])
+
+        library_filter.focus(
+            fn=lambda: gr.update(choices=list_libraries()),
+            inputs=[],
+            outputs=[library_filter]
+        )
+
         show_chunks = gr.Checkbox(label="Show Retrieved Chunks", value=True)
         show_explanation = gr.Checkbox(label="Show explanation in answer", value=False)
         answer_btn = gr.Button("🧠 Get Answer")
@@ -115,21 +193,33 @@ with gr.Blocks(theme=gr.themes.Soft(primary_hue="blue")) as demo:
             show_context_btn = gr.Button("📄 Show Full Context")
             hide_context_btn = gr.Button("🧹 Hide Full Context")
    
-    # ✅ Persistent history box
+    # ✅ History box: this session's questions only (the full log can be exported)
         history = gr.Textbox(label="🕘 Query History", lines=10, interactive=False)
-        # ✅ Load saved history on app start
-        try:
-            with open("query_history.json", "r", encoding="utf-8") as f:
-                saved_history = "\n".join(json.load(f))
-        except:
-            saved_history = ""
+        session_history = gr.State([])
+        history_page = gr.State(0)
+        with gr.Row():
+            older_btn = gr.Button("⬅️ Older")
+            newer_btn = gr.Button("➡️ Newer")
 
-        history.value = saved_history
+        older_btn.click(
+            fn=lambda page, entries: show_history_page(page + 1, entries),
+            inputs=[history_page, session_history],
+            outputs=[history, history_page]
+        )
+
+        newer_btn.click(
+            fn=lambda page, entries: show_history_page(page - 1, entries),
+            inputs=[history_page, session_history],
+            outputs=[history, history_page]
+        )
 
         answer_btn.click(
-            fn=ask_question,
-            inputs=[question, show_chunks, model_choice, show_explanation],
-            outputs=[answer_output, context_preview, context_full, history]
+            fn=handle_ask,
+            inputs=[question, show_chunks, model_choice, show_explanation, library_filter, file_type_filter,
+                    session_history],
+            outputs=[answer_output, context_preview, context_full, history, session_history, history_page],
+            concurrency_limit=LLM_EVENT_CONCURRENCY,
+            concurrency_id="answer"
         )
 
         show_context_btn.click(
@@ -158,13 +248,15 @@ with gr.Blocks(theme=gr.themes.Soft(primary_hue="blue")) as demo:
         suggest_btn.click(
             fn=handle_suggestions,
             inputs=[question_style],
-            outputs=[suggested_questions, source_info]
+            outputs=[suggested_questions, source_info],
+            concurrency_limit=LLM_EVENT_CONCURRENCY
         )
 
         suggested_questions.change(
             fn=answer_selected_question,
-            inputs=[suggested_questions, show_chunks, model_choice],
-            outputs=[question, answer_output, context_preview, context_full, history]
+            inputs=[suggested_questions, show_chunks, model_choice, session_history],
+            outputs=[question, answer_output, context_preview, context_full, history, session_history, history_page],
+            concurrency_id="answer"
         )
 
     with gr.Tab("📤 Export Answer"):
@@ -177,13 +269,33 @@ with gr.Blocks(theme=gr.themes.Soft(primary_hue="blue")) as demo:
         include_citations = gr.Checkbox(label="Include citation footer", value=True)
         export_btn = gr.Button("📦 Export Answer")
         export_file = gr.File(label="Download Export")
+        export_status = gr.Markdown()
 
         export_btn.click(
             fn=handle_export,
             inputs=[export_format, question, answer_output, context_full, model_choice, include_citations],
-            outputs=[export_file]
+            outputs=[export_file, export_status],
+            concurrency_id="export"
         )
 
+        with gr.Accordion("🗂 Export Query History", open=False):
+            gr.Markdown("Export many history entries at once. Leave the filters empty to export everything.")
+            history_format = gr.Dropdown(choices=list(EXPORT_FORMATS), label="Export Format", value="ZIP")
+            with gr.Row():
+                history_since = gr.Textbox(label="From (YYYY-MM-DD)", value="")
+                history_until = gr.Textbox(label="To (YYYY-MM-DD)", value="")
+                history_contains = gr.Textbox(label="Containing", value="")
+            history_export_btn = gr.Button("📦 Export History")
+            history_file = gr.File(label="Download History")
+            history_status = gr.Markdown()
+
+            history_export_btn.click(
+                fn=handle_history_export,
+                inputs=[history_format, history_since, history_until, history_contains],
+                outputs=[history_file, history_status],
+                concurrency_id="export"
+            )
+
     with gr.Tab("📘 Glossary Editor"):
         gr.Markdown("### Add or Update Glossary Terms")
         glossary_term = gr.Textbox(label="Term")
@@ -192,11 +304,8 @@ with gr.Blocks(theme=gr.themes.Soft(primary_hue="blue")) as demo:
         glossary_status = gr.Textbox(label="Status", interactive=False)
 
         def update_glossary(term, definition):
-            global glossary
             term = term.lower().strip()
-            glossary[term] = definition
-            with open("glossary.json", "w", encoding="utf-8") as f:
-                json.dump(glossary, f, indent=2, ensure_ascii=False)
+            get_glossary().set(term, definition)  # locked, atomic rewrite of glossary.json
             safe_term = ''.join(c for c in term if ord(c) < 256)
             return f"✅ Glossary updated: '{safe_term}'"
 
@@ -214,4 +323,15 @@ with gr.Blocks(theme=gr.themes.Soft(primary_hue="blue")) as demo:
                 outputs=[glossary_view]
             )
 
-demo.launch()
\ No newline at end of file
+record_timing("ui build", time.perf_counter() - _ui_started)
+
+if __name__ == "__main__":
+    print(startup_report())
+    # Models and the index load in the background while the UI is already serving
+    warm_up(background=True)
+    # Background ingestion; resumes jobs interrupted by a previous shutdown
+    ingest_jobs.start()
+    # Per-stage timings, token counts and cache hit rates (only when DOCMENTOR_METRICS_PORT is set)
+    serve_metrics()
+    # Queueing is required for generator handlers to stream partial answers
+    demo.queue(default_concurrency_limit=QUEUE_CONCURRENCY, max_size=QUEUE_MAX_SIZE).launch()
@@ -0,0 +1,355 @@
+# benchmarks/run_benchmark.py
+"""
+End-to-end benchmark: builds a synthetic corpus, then times document loading,
+chunking, ingestion, retrieval and ask_question against a deterministic Ollama stub.
+
+Everything runs inside a scratch working directory, so the real ./embeddings,
+history and glossary files are never touched. Results are written as JSON so runs
+on different commits can be compared.
+
+    python benchmarks/run_benchmark.py --docs 20 --paragraphs 40 --queries 50 --out bench.json
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_ollama import start_stub
+
+SYLLABLES = ["ka", "lo", "mi", "tra", "ven", "sol", "dor", "pi", "nex", "qua", "ri", "tem", "bal", "zo", "fen", "gri"]
+
+
+# ✅ Helpers
+def percentiles(samples):
+    """p50/p95/p99, mean and max of a list of seconds, reported in milliseconds."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] * 1000
+
+    return {"n": len(ordered), "p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99),
+            "mean_ms": sum(ordered) / len(ordered) * 1000, "max_ms": ordered[-1] * 1000}
+
+
+@contextlib.contextmanager
+def quiet(enabled=True):
+    # The app prints on its hot paths; keep the benchmark output readable
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+# ✅ Synthetic corpus
+def make_vocabulary(rng, size=2000):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))))
+    return sorted(words)
+
+
+def make_paragraph(rng, vocabulary, sentences=6):
+    lines = []
+    for _ in range(sentences):
+        words = [rng.choice(vocabulary) for _ in range(rng.randint(8, 20))]
+        lines.append(" ".join(words).capitalize() + ".")
+    return " ".join(lines)
+
+
+def build_corpus(directory, docs, paragraphs, formats, seed):
+    """Writes `docs` files cycling through `formats`; returns (paths, sample sentences for queries)."""
+    from docx import Document
+    from fpdf import FPDF
+
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng)
+    paths, sentences = [], []
+    for i in range(docs):
+        fmt = formats[i % len(formats)]
+        body = [make_paragraph(rng, vocabulary) for _ in range(paragraphs)]
+        sentences.extend(p.split(". ")[0] for p in body)
+        path = os.path.join(directory, f"doc_{i:04d}.{fmt}")
+        if fmt == "txt":
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n\n".join(body))
+        elif fmt == "docx":
+            document = Document()
+            for paragraph in body:
+                document.add_paragraph(paragraph)
+            document.save(path)
+        elif fmt == "pdf":
+            pdf = FPDF()
+            pdf.add_page()
+            pdf.set_font("Arial", size=11)
+            for paragraph in body:
+                pdf.multi_cell(0, 6, paragraph)
+            pdf.output(path)
+        else:
+            raise ValueError(f"Unsupported format: {fmt}")
+        paths.append(path)
+    return paths, sentences
+
+
+def make_queries(rng, sentences, count):
+    queries = []
+    for sentence in rng.sample(sentences, min(count, len(sentences))):
+        words = sentence.split()
+        start = rng.randint(0, max(0, len(words) - 6))
+        queries.append(" ".join(words[start:start + 6]).lower())
+    return queries
+
+
+# ✅ Stages
+def bench_load(paths):
+    from utils.file_loader import load_document
+    texts, timings = [], []
+    for path in paths:
+        started = time.perf_counter()
+        texts.append(load_document(path))
+        timings.append(time.perf_counter() - started)
+    total = sum(timings)
+    chars = sum(len(text) for text in texts)
+    return texts, {"files": len(paths), "seconds": total, "chars": chars,
+                   "chars_per_sec": chars / total if total else 0.0, "per_file": percentiles(timings)}
+
+
+def bench_chunk(texts):
+    from utils.chunker import chunk_text
+    started = time.perf_counter()
+    chunks = sum(len(chunk_text(text)) for text in texts)
+    seconds = time.perf_counter() - started
+    return {"chunks": chunks, "seconds": seconds, "chunks_per_sec": chunks / seconds if seconds else 0.0}
+
+
+def bench_ingest(paths, workers):
+    from ingest_pipeline import ingest_paths
+    first = ingest_paths(paths, load_workers=workers)
+    # Second pass measures the unchanged-file fast path
+    again = ingest_paths(paths, load_workers=workers)
+    return {"chunks": first["chunks"], "seconds": first["seconds"], "chunks_per_sec": first["chunks_per_sec"],
+            "reingest_unchanged_seconds": again["seconds"]}
+
+
+def bench_retrieval(queries):
+    from resources import get_embedder
+    from search import hybrid_search
+    embed, search, total = [], [], []
+    for query in queries:
+        started = time.perf_counter()
+        embedding = get_embedder().encode(query).tolist()
+        embedded = time.perf_counter()
+        hybrid_search(query, embedding, top_k=5)
+        finished = time.perf_counter()
+        embed.append(embedded - started)
+        search.append(finished - embedded)
+        total.append(finished - started)
+    return {"embed_query": percentiles(embed), "search": percentiles(search), "retrieval": percentiles(total)}
+
+
+def bench_compact(queries, k=10):
+    """Recall@k and latency of each compact index mode against exact float32 search."""
+    import numpy as np
+    from resources import get_embedder, get_collection
+    from compact_index import CompactIndex, MODES
+    stored = get_collection().get(include=["embeddings"])
+    ids, vectors = stored["ids"], np.asarray(stored["embeddings"], dtype=np.float32)
+    if not len(ids):
+        return {}
+    embeddings = [np.asarray(get_embedder().encode(query), dtype=np.float32) for query in queries]
+
+    exact, timings = [], []
+    for query in embeddings:
+        started = time.perf_counter()
+        nearest = np.argsort(((vectors - query) ** 2).sum(axis=1))[:k]
+        timings.append(time.perf_counter() - started)
+        exact.append({ids[i] for i in nearest})
+    results = {"float32": {"recall": 1.0, "latency": percentiles(timings), "bytes_per_vector": vectors.shape[1] * 4}}
+
+    for mode in MODES:
+        index = CompactIndex(os.path.join("compact-bench", mode), mode=mode)
+        index.upsert(ids, vectors)
+        recall, timings = [], []
+        for query, expected in zip(embeddings, exact):
+            started = time.perf_counter()
+            found = {doc_id for doc_id, _ in index.search(query, k)}
+            timings.append(time.perf_counter() - started)
+            recall.append(len(found & expected) / len(expected))
+        results[mode] = {"recall": sum(recall) / len(recall), "latency": percentiles(timings),
+                         "bytes_per_vector": index.memory_bytes() / len(ids)}
+    return results
+
+
+def bench_rerank(queries, model_name):
+    """
+    Cost and effect of cross-encoder reranking: latency per question, chunks kept, prompt
+    size against the fixed top 5, and how many questions would skip generation.
+    """
+    from resources import get_embedder
+    from search import hybrid_search_many
+    from reranker import Reranker
+    from retriever import MODEL_TAGS, CONTEXT_BUDGETS, DEFAULT_CONTEXT_BUDGET, TOP_K
+    from utils.context_packer import pack_context, estimate_tokens
+    budget = CONTEXT_BUDGETS.get(MODEL_TAGS.get(model_name), DEFAULT_CONTEXT_BUDGET)
+    reranker = Reranker()
+    started = time.perf_counter()
+    reranker.rerank("warm up", [{"document": "warm up"}])  # loads the cross-encoder
+    load_seconds = time.perf_counter() - started
+
+    def prompt_tokens(hits):
+        return sum(estimate_tokens(piece["text"]) for piece in pack_context(hits, budget))
+
+    timings, kept, fixed_tokens, reranked_tokens, skipped = [], [], [], [], 0
+    embeddings = [get_embedder().encode(query).tolist() for query in queries]
+    candidates = hybrid_search_many(queries, embeddings, top_k=reranker.candidates)
+    for query, hits in zip(queries, candidates):
+        started = time.perf_counter()
+        ranked = reranker.rerank(query, hits)
+        timings.append(time.perf_counter() - started)
+        fixed_tokens.append(prompt_tokens(hits[:TOP_K]))
+        if reranker.is_confident(ranked):
+            kept.append(len(ranked))
+            reranked_tokens.append(prompt_tokens(ranked))
+        else:
+            skipped += 1
+    started = time.perf_counter()
+    reranker.rerank_many(queries, candidates)
+    batch_seconds = time.perf_counter() - started
+    return {"model_load_seconds": load_seconds, "candidates": reranker.candidates,
+            "rerank": percentiles(timings), "batched_rerank_per_question_ms": batch_seconds / len(queries) * 1000,
+            "mean_k": sum(kept) / len(kept) if kept else 0.0, "skipped_generation": skipped,
+            "mean_prompt_tokens_fixed": sum(fixed_tokens) / len(fixed_tokens),
+            "mean_prompt_tokens_reranked": sum(reranked_tokens) / len(reranked_tokens) if reranked_tokens else 0.0}
+
+
+def bench_ask(queries, model_name):
+    from retriever import ask_question
+    first_output, total = [], []
+    for query in queries:
+        started = time.perf_counter()
+        first = None
+        for _ in ask_question(query, True, model_name):
+            if first is None:
+                first = time.perf_counter() - started
+        total.append(time.perf_counter() - started)
+        first_output.append(first)
+    return {"first_output": percentiles(first_output), "end_to_end": percentiles(total)}
+
+
+def bench_batch(queries, model_name):
+    from retriever import answer_questions
+    started = time.perf_counter()
+    answers = answer_questions(queries, model_name)
+    seconds = time.perf_counter() - started
+    return {"questions": len(answers), "seconds": seconds,
+            "questions_per_sec": len(answers) / seconds if seconds else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DocMentor ingestion, retrieval and answering.")
+    parser.add_argument("--docs", type=int, default=20, help="Synthetic documents to generate")
+    parser.add_argument("--paragraphs", type=int, default=40, help="Paragraphs per document")
+    parser.add_argument("--formats", default="txt,docx,pdf", help="Comma-separated mix of txt, docx, pdf")
+    parser.add_argument("--queries", type=int, default=50, help="Questions to time")
+    parser.add_argument("--model", default="Phi3-mini (smart synthesis)", help="Model name as shown in the UI")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Extraction processes for ingestion")
+    parser.add_argument("--tokens", type=int, default=40, help="Tokens per stub answer")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Stub seconds per token")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--workdir", help="Scratch directory (default: a new temp dir)")
+    parser.add_argument("--out", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--rerank", action="store_true", help="Also measure cross-encoder reranking")
+    parser.add_argument("--verbose", action="store_true", help="Keep the app's own log output")
+    args = parser.parse_args()
+
+    out_path = os.path.abspath(args.out)
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="docmentor-bench-"))
+    corpus_dir = os.path.join(workdir, "corpus")
+    os.makedirs(corpus_dir, exist_ok=True)
+
+    # The app keeps its index, history and glossary relative to the working directory,
+    # and reads the Ollama address at import time: both must be set before importing it
+    stub = start_stub(tokens=args.tokens, token_delay=args.token_delay)
+    os.environ["OLLAMA_HOST"] = f"http://127.0.0.1:{stub.server_port}"
+    if args.rerank:
+        os.environ["DOCMENTOR_RERANK"] = "1"   # the ask stages then rerank too
+    os.chdir(workdir)
+
+    rng = random.Random(args.seed)
+    formats = [fmt.strip() for fmt in args.formats.split(",") if fmt.strip()]
+    print(f"[⏱] Building corpus: {args.docs} docs x {args.paragraphs} paragraphs in {workdir}")
+    paths, sentences = build_corpus(corpus_dir, args.docs, args.paragraphs, formats, args.seed)
+    queries = make_queries(rng, sentences, args.queries)
+
+    results = {}
+    with quiet(not args.verbose):
+        from resources import get_embedder, get_collection
+        from metrics import metrics, set_verbose
+        set_verbose(args.verbose)
+        started = time.perf_counter()
+        get_embedder()
+        get_collection()
+        results["warm_up_seconds"] = time.perf_counter() - started
+
+        texts, results["load"] = bench_load(paths)
+        results["chunk"] = bench_chunk(texts)
+        results["ingest"] = bench_ingest(paths, args.workers)
+        results["retrieval"] = bench_retrieval(queries)
+        results["compact_index"] = bench_compact(queries)
+        if args.rerank:
+            results["rerank"] = bench_rerank(queries, args.model)
+        results["ask_cold"] = bench_ask(queries, args.model)
+        results["ask_cold"]["trace"] = metrics.snapshot()
+        metrics.reset()
+        # Same questions again: served from the answer cache
+        results["ask_warm"] = bench_ask(queries, args.model)
+        results["ask_warm"]["trace"] = metrics.snapshot()
+        # Fresh questions through the batched API (one embedding pass and one Chroma query per batch)
+        results["ask_batch"] = bench_batch(make_queries(random.Random(args.seed + 1), sentences, args.queries), args.model)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": results,
+    }
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    stub.shutdown()
+
+    print(f"[✓] Ingest: {results['ingest']['chunks']} chunks at {results['ingest']['chunks_per_sec']:.1f} chunks/sec")
+    print(f"[✓] Retrieval p50/p95/p99: {results['retrieval']['retrieval']['p50_ms']:.1f} / "
+          f"{results['retrieval']['retrieval']['p95_ms']:.1f} / {results['retrieval']['retrieval']['p99_ms']:.1f} ms")
+    print(f"[✓] End-to-end p50/p95/p99: {results['ask_cold']['end_to_end']['p50_ms']:.1f} / "
+          f"{results['ask_cold']['end_to_end']['p95_ms']:.1f} / {results['ask_cold']['end_to_end']['p99_ms']:.1f} ms")
+    if "rerank" in results:
+        print(f"[✓] Rerank p50/p95: {results['rerank']['rerank']['p50_ms']:.1f} / {results['rerank']['rerank']['p95_ms']:.1f} ms, "
+              f"mean k {results['rerank']['mean_k']:.1f}, {results['rerank']['skipped_generation']} generation(s) skipped")
+    print(f"[✓] Results written to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
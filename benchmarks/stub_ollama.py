@@ -0,0 +1,88 @@
+# benchmarks/stub_ollama.py
+"""
+Deterministic stand-in for Ollama's /api/generate, so benchmarks measure DocMentor
+rather than the model. The answer is derived from a hash of the prompt, and the
+stub sleeps `token_delay` seconds per token to imitate generation speed.
+
+Run standalone:  python benchmarks/stub_ollama.py --port 11500
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = "the document explains that results depend on context and careful reading of each section".split()
+
+
+def stub_answer(prompt, tokens):
+    seed = int(hashlib.sha1(prompt.encode("utf-8")).hexdigest(), 16)
+    return [WORDS[(seed >> (i % 64)) % len(WORDS)] + " " for i in range(tokens)]
+
+
+def make_handler(tokens, token_delay, first_token_delay):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, body, content_type):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            prompt = request.get("prompt", "")
+            pieces = stub_answer(prompt, tokens)
+            counts = {"prompt_eval_count": len(prompt) // 4, "eval_count": len(pieces)}
+            time.sleep(first_token_delay)
+
+            if not request.get("stream", True):
+                time.sleep(token_delay * len(pieces))
+                body = json.dumps(dict(counts, model=request.get("model"), response="".join(pieces), done=True))
+                self._send(body.encode("utf-8"), "application/json")
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for piece in pieces:
+                time.sleep(token_delay)
+                self._chunk(json.dumps({"response": piece, "done": False}))
+            self._chunk(json.dumps(dict(counts, response="", done=True)))
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _chunk(self, line):
+            data = (line + "\n").encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_stub(port=0, tokens=40, token_delay=0.0, first_token_delay=0.0):
+    """Starts the stub on a background thread; returns the server (see `server_port`)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(tokens, token_delay, first_token_delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deterministic Ollama stub for benchmarks.")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    args = parser.parse_args()
+    server = start_stub(args.port, args.tokens, args.token_delay)
+    print(f"[✓] Ollama stub listening on http://127.0.0.1:{server.server_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
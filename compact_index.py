@@ -0,0 +1,271 @@
+# compact_index.py
+import os
+import json
+import tempfile
+import threading
+import numpy as np
+from resources import DEFAULT_LIBRARY, library_of
+
+# ✅ Compact index settings
+COMPACT_INDEX_DIR = "./embeddings/compact"
+COMPACT_MODE = os.environ.get("DOCMENTOR_COMPACT_INDEX", "")  # "", "int8" or "binary"
+MODES = ("int8", "binary")
+OVERSAMPLE = {"int8": 4, "binary": 32}   # candidates rescored in float, per requested hit
+SCAN_BLOCK = 65536                        # rows scored per step, bounds temporary memory
+COMPACT_RATIO = 0.25                      # rewrite the files once this share of rows is deleted
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def quantize(vectors, mode):
+    """
+    Returns (codes, scales): int8 codes with one float scale per row, or packed sign bits.
+    For int8 the scale file also carries each row's squared norm, so the scan ranks by L2.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if mode == "binary":
+        return np.packbits(vectors > 0, axis=1), np.ones((len(vectors), 2), dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, np.stack([scales, (vectors ** 2).sum(axis=1)], axis=1).astype(np.float32)
+
+
+class CompactIndex:
+    """
+    Quantized side index over the default library's chunk embeddings, for faster scans.
+
+    Candidates are found by scanning int8 (about 4x smaller than float32) or binary
+    (32x smaller) codes, then rescored exactly against a float32 copy of the vectors, which
+    stays on disk and is memory-mapped so only the candidates' pages are read. Chroma keeps
+    its own embeddings, so this adds to disk use rather than replacing them; filtered
+    searches and other libraries still go through Chroma. Distances are
+    squared L2, like Chroma's default space, so scores stay comparable. Binary codes keep
+    only signs, so that mode suits normalized embeddings (such as MiniLM's) best.
+
+    Files are append-only; upserts and deletes tombstone old rows and the files are
+    rewritten once too many rows are dead. Chroma remains the store of documents and metadata.
+    """
+
+    def __init__(self, directory=COMPACT_INDEX_DIR, mode="int8", dim=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown compact index mode: {mode}")
+        self.directory = directory
+        self.mode = mode
+        self.dim = dim  # taken from the stored index or the first upsert when None
+        self._lock = threading.RLock()
+        self._loaded = False
+
+    # ✅ Storage
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _code_width(self):
+        return (self.dim + 7) // 8 if self.mode == "binary" else self.dim
+
+    def _load(self):
+        if self._loaded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        rows = 0
+        try:
+            with open(self._path("meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["mode"] == self.mode and self.dim in (None, meta["dim"]):
+                rows = meta["rows"]
+                self.dim = meta["dim"]
+        except FileNotFoundError:
+            pass
+        # Anything past the committed row count is a write interrupted by a crash
+        widths = {"vectors.f32": 4, "codes.bin": 1, "scales.f32": 8}
+        if rows:
+            widths.update({"vectors.f32": self.dim * 4, "codes.bin": self._code_width()})
+        else:
+            open(self._path("deleted.txt"), "w").close()
+        for name, width in widths.items():
+            with open(self._path(name), "ab") as f:
+                f.truncate(rows * width)
+        self._ids = []
+        if rows:
+            with open(self._path("ids.txt"), "r", encoding="utf-8") as f:
+                self._ids = f.read().split("\n")[:rows]
+        with open(self._path("ids.txt"), "w", encoding="utf-8") as f:
+            f.write("".join(doc_id + "\n" for doc_id in self._ids))
+        self._alive = np.ones(rows, dtype=bool)
+        if rows:
+            with open(self._path("deleted.txt"), "r", encoding="utf-8") as f:
+                dead = [int(line) for line in f if line.strip() and int(line) < rows]
+            self._alive[dead] = False
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids) if self._alive[row]}
+        self._map()
+        self._loaded = True
+
+    def _map(self):
+        rows = len(self._ids)
+        if rows:
+            self._vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r", shape=(rows, self.dim))
+            self._codes = np.memmap(self._path("codes.bin"), dtype=np.uint8 if self.mode == "binary" else np.int8,
+                                    mode="r", shape=(rows, self._code_width()))
+            self._scales = np.memmap(self._path("scales.f32"), dtype=np.float32, mode="r", shape=(rows, 2))
+        else:
+            self._vectors = self._codes = self._scales = None
+
+    def _write_meta(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".meta-", suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"mode": self.mode, "dim": self.dim, "rows": len(self._ids)}, f)
+        os.replace(tmp_path, self._path("meta.json"))
+
+    def _tombstone(self, rows):
+        if not rows:
+            return
+        self._alive[rows] = False
+        with open(self._path("deleted.txt"), "a", encoding="utf-8") as f:
+            f.write("".join(f"{row}\n" for row in rows))
+
+    # ✅ Writes
+    def upsert(self, ids, embeddings):
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        codes, scales = quantize(vectors, self.mode)
+        with self._lock:
+            self._load()
+            if self.dim is None or not self._ids:
+                self.dim = vectors.shape[1]
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional embeddings, got {vectors.shape[1]}")
+            self._tombstone([self._rows[doc_id] for doc_id in ids if doc_id in self._rows])
+            start = len(self._ids)
+            for name, values in (("vectors.f32", vectors), ("codes.bin", codes), ("scales.f32", scales)):
+                with open(self._path(name), "ab") as f:
+                    f.write(values.tobytes())
+            with open(self._path("ids.txt"), "a", encoding="utf-8") as f:
+                f.write("".join(doc_id + "\n" for doc_id in ids))
+            self._ids.extend(ids)
+            self._alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+            self._rows.update((doc_id, start + i) for i, doc_id in enumerate(ids))
+            self._write_meta()  # rows become visible only once this is written
+            self._map()
+            self._maybe_compact()
+
+    def delete(self, ids):
+        with self._lock:
+            self._load()
+            self._tombstone([self._rows.pop(doc_id) for doc_id in ids if doc_id in self._rows])
+            self._maybe_compact()
+
+    def on_ingest(self, event, ids, documents, metadatas, embeddings=None):
+        # Covers the default library; other library shards are searched through Chroma.
+        # Deletes need no filtering: ids the index never held are ignored.
+        if event == "upsert":
+            keep = [i for i, (doc_id, meta) in enumerate(zip(ids, metadatas or [None] * len(ids)))
+                    if ((meta or {}).get("library") or library_of(doc_id)) == DEFAULT_LIBRARY]
+            if len(keep) < len(ids):
+                ids = [ids[i] for i in keep]
+                embeddings = None if embeddings is None else [embeddings[i] for i in keep]
+        if not ids:
+            return
+        if event == "upsert" and embeddings is not None:
+            self.upsert(ids, embeddings)
+        elif event == "delete":
+            self.delete(ids)
+
+    def _maybe_compact(self):
+        dead = len(self._ids) - len(self._rows)
+        if dead and dead >= COMPACT_RATIO * len(self._ids):
+            self.compact()
+
+    def compact(self):
+        """Rewrites the files without deleted rows."""
+        with self._lock:
+            self._load()
+            keep = np.flatnonzero(self._alive)
+            ids = [self._ids[row] for row in keep]
+            vectors = np.array(self._vectors[keep]) if len(keep) else b""
+            codes = np.array(self._codes[keep]) if len(keep) else b""
+            scales = np.array(self._scales[keep]) if len(keep) else b""
+            self._vectors = self._codes = self._scales = None  # release the maps before replacing the files
+            for name, values in (("vectors.f32", vectors), ("codes.bin", codes), ("scales.f32", scales)):
+                with open(self._path(name), "wb") as f:
+                    f.write(bytes(values) if isinstance(values, bytes) else values.tobytes())
+            with open(self._path("ids.txt"), "w", encoding="utf-8") as f:
+                f.write("".join(doc_id + "\n" for doc_id in ids))
+            open(self._path("deleted.txt"), "w").close()
+            self._ids = ids
+            self._alive = np.ones(len(ids), dtype=bool)
+            self._rows = {doc_id: row for row, doc_id in enumerate(ids)}
+            self._write_meta()
+            self._map()
+
+    def clear(self):
+        with self._lock:
+            self._load()
+            self._alive[:] = False
+            self._rows.clear()
+            self.compact()
+
+    def count(self):
+        with self._lock:
+            self._load()
+            return len(self._rows)
+
+    def memory_bytes(self):
+        """Bytes scanned per query (codes, plus scale and norm for int8), versus dim * 4 per row for float32."""
+        with self._lock:
+            self._load()
+            return len(self._ids) * (self._code_width() + (8 if self.mode == "int8" else 0))
+
+    def rebuild(self, collection, page_size=1000):
+        """Re-indexes every embedding stored in a Chroma collection."""
+        self.clear()
+        offset = 0
+        while True:
+            page = collection.get(include=["embeddings"], limit=page_size, offset=offset)
+            if not len(page["ids"]):
+                break
+            self.upsert(page["ids"], page["embeddings"])
+            offset += len(page["ids"])
+        return offset
+
+    # ✅ Search
+    def _approximate(self, query, limit):
+        # Best `limit` rows by quantized score, scanned block by block
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        if self.mode == "binary":
+            query_bits = np.packbits(query > 0)
+        for start in range(0, len(self._ids), SCAN_BLOCK):
+            block = self._codes[start:start + SCAN_BLOCK]
+            if self.mode == "binary":
+                # Fewer differing sign bits is better; negate so higher is better
+                scores = -_POPCOUNT[np.bitwise_xor(block, query_bits)].sum(axis=1, dtype=np.int32).astype(np.float32)
+            else:
+                # Ranking by -|x - q|^2 reduces to 2 x.q - |x|^2
+                scales = self._scales[start:start + SCAN_BLOCK]
+                scores = 2 * (block.astype(np.float32) @ query) * scales[:, 0] - scales[:, 1]
+            scores[~self._alive[start:start + SCAN_BLOCK]] = -np.inf
+            best_rows = np.concatenate([best_rows, np.arange(start, start + len(block))])
+            best_scores = np.concatenate([best_scores, scores])
+            if len(best_rows) > limit:
+                top = np.argpartition(-best_scores, limit)[:limit]
+                best_rows, best_scores = best_rows[top], best_scores[top]
+        return best_rows[np.isfinite(best_scores)]
+
+    def search(self, query_embedding, k=20, oversample=None):
+        """
+        Returns [(chunk id, squared L2 distance)] for the k nearest chunks, nearest first.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        with self._lock:
+            self._load()
+            if not self._rows:
+                return []
+            candidates = self._approximate(query, k * (oversample or OVERSAMPLE[self.mode]))
+            candidates.sort()  # sequential reads from the float file
+            vectors = np.asarray(self._vectors[candidates])
+            ids = [self._ids[row] for row in candidates]
+        distances = ((vectors - query) ** 2).sum(axis=1)
+        order = np.argsort(distances)[:k]
+        return [(ids[i], float(distances[i])) for i in order]
+
+
+compact_index = CompactIndex(mode=COMPACT_MODE) if COMPACT_MODE else None
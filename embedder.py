@@ -1,7 +1,13 @@
 # embedder.py
-from sentence_transformers import SentenceTransformer
-import chromadb
+# Kept for compatibility: these names now resolve lazily through resources.py
+from resources import get_embedder, get_chroma_client, get_collection
 
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
-chroma_client = chromadb.PersistentClient(path="./embeddings")
-collection = chroma_client.get_or_create_collection(name="doc_chunks")
\ No newline at end of file
+
+def __getattr__(name):
+    if name == "embedder":
+        return get_embedder()
+    if name == "chroma_client":
+        return get_chroma_client()
+    if name == "collection":
+        return get_collection()
+    raise AttributeError(f"module 'embedder' has no attribute '{name}'")
@@ -0,0 +1,222 @@
+# exports.py
+import os
+import re
+import time
+import uuid
+import zipfile
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
+from fpdf import FPDF
+from history_store import history
+
+# ✅ Export settings
+EXPORT_DIR = "./exports"
+EXPORT_WORKERS = 2          # exports rendered at once, off the UI/request threads
+EXPORT_KEEP = 200           # newest files kept in the export folder; older ones are pruned
+EXPORT_GRACE = 3600         # seconds an export is never pruned, so it can still be downloaded
+POLL_INTERVAL = 0.5         # seconds between progress updates while an export renders
+BULK_PDF_LIMIT = 500        # FPDF holds the whole document in memory, so larger exports should use TXT/ZIP
+EXPORT_FORMATS = ("PDF", "TXT", "ZIP")
+
+
+# ✅ Utility: Strip unsupported characters for PDF (FPDF core fonts are latin-1)
+def strip_unsupported(text):
+    return text.encode("latin-1", "ignore").decode("latin-1")
+
+
+def format_entry(entry):
+    header = " | ".join(str(value) for value in (entry.get("timestamp"), entry.get("model")) if value)
+    lines = [f"[{header}]"] if header else []
+    lines += [f"Q: {entry['question']}", f"A: {entry['answer']}"]
+    if entry.get("sources"):
+        lines.append(f"Sources: {', '.join(entry['sources'])}")
+    return "\n".join(lines) + "\n---\n"
+
+
+def select_entries(entries, since=None, until=None, contains=None):
+    """
+    Filters history entries lazily.
+
+    Parameters:
+        entries (iterable[dict]): History entries, e.g. `history.iter_entries()`.
+        since (str): Earliest ISO date/time to include, e.g. "2024-05-01".
+        until (str): Latest ISO date/time to include; a bare date covers that whole day.
+        contains (str): Case-insensitive text the question or answer must contain.
+    """
+    needle = contains.lower().strip() if contains else None
+    for entry in entries:
+        stamp = entry.get("timestamp") or ""
+        if since and stamp[:len(since)] < since:
+            continue
+        if until and stamp[:len(until)] > until:
+            continue
+        if needle and needle not in entry["question"].lower() and needle not in entry["answer"].lower():
+            continue
+        yield entry
+
+
+def _slug(text, length=40):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower())[:length].strip("-") or "entry"
+
+
+class ExportManager:
+    """
+    Renders exports on a small worker pool into a managed folder.
+
+    File names carry a timestamp plus a random suffix, so concurrent exports never collide.
+    Each file is written under a temporary name and renamed when complete, so a download
+    never sees a half-written export. Only the newest `keep` exports are retained, and
+    none younger than `grace` seconds, so a file is never removed before it is downloaded.
+    """
+
+    def __init__(self, directory=EXPORT_DIR, workers=EXPORT_WORKERS, keep=EXPORT_KEEP, grace=EXPORT_GRACE):
+        self.directory = directory
+        self.keep = keep
+        self.grace = grace
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export")
+
+    # ✅ File management
+    def _path(self, prefix, extension):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return os.path.abspath(os.path.join(self.directory, f"{prefix}_{stamp}_{uuid.uuid4().hex[:8]}.{extension}"))
+
+    def _write(self, prefix, extension, writer):
+        path = self._path(prefix, extension)
+        partial = path + ".part"
+        try:
+            writer(partial)
+            os.replace(partial, path)
+        except Exception:
+            if os.path.exists(partial):
+                os.unlink(partial)
+            raise
+        self._prune()
+        print(f"[✓] {extension.upper()} saved to: {path}")
+        return path
+
+    def _prune(self):
+        try:
+            files = [entry for entry in os.scandir(self.directory) if entry.is_file() and not entry.name.endswith(".part")]
+        except FileNotFoundError:
+            return
+        files.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        cutoff = time.time() - self.grace
+        for entry in files[self.keep:]:
+            if entry.stat().st_mtime > cutoff:
+                continue
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                pass
+
+    # ✅ Single answer
+    def answer_pdf(self, question, answer, context, sources=None, model_name=None, include_citations=False):
+        def write(path):
+            pdf = _new_pdf()
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            content = f"""Generated on: {timestamp}
+Model: {model_name}
+Sources: {sources}
+
+Question:
+{question}
+
+Answer:
+{answer}
+
+Context:
+{context}
+"""
+            pdf.multi_cell(0, 10, strip_unsupported(content))
+
+            if include_citations and sources:
+                pdf.set_y(-30)
+                pdf.set_font("Arial", size=10)
+                pdf.multi_cell(0, 10, strip_unsupported(f"Sources: {sources}"))
+            _footer(pdf)
+            pdf.output(path)
+
+        return self._write("answer", "pdf", write)
+
+    def answer_txt(self, answer, sources=None):
+        def write(path):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(answer)
+                if sources:
+                    f.write(f"\n\nSources: {sources}")
+
+        return self._write("answer", "txt", write)
+
+    # ✅ Bulk history, streamed from the JSONL log
+    def history(self, format="TXT", since=None, until=None, contains=None):
+        """
+        Exports every history entry matching the filters into one file.
+
+        TXT and ZIP are streamed entry by entry, so memory stays flat however long the
+        history is. ZIP holds one text file per entry. PDF stops after BULK_PDF_LIMIT entries.
+
+        Returns:
+            tuple: (path, number of entries exported)
+        """
+        entries = select_entries(history.iter_entries(), since, until, contains)
+        count = [0]
+
+        def write_txt(path):
+            with open(path, "w", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(format_entry(entry))
+                    count[0] += 1
+
+        def write_zip(path):
+            with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                for entry in entries:
+                    count[0] += 1
+                    archive.writestr(f"{count[0]:06d}_{_slug(entry['question'])}.txt", format_entry(entry))
+
+        def write_pdf(path):
+            pdf = _new_pdf()
+            for entry in entries:
+                if count[0] >= BULK_PDF_LIMIT:
+                    pdf.multi_cell(0, 10, "... more entries not shown; export as TXT or ZIP for the full history.")
+                    break
+                pdf.multi_cell(0, 10, strip_unsupported(format_entry(entry)))
+                count[0] += 1
+            _footer(pdf)
+            pdf.output(path)
+
+        writers = {"TXT": ("txt", write_txt), "ZIP": ("zip", write_zip), "PDF": ("pdf", write_pdf)}
+        if format not in writers:
+            raise ValueError(f"Unsupported export format: {format}")
+        extension, writer = writers[format]
+        return self._write("history", extension, writer), count[0]
+
+    # ✅ Background submission
+    def submit(self, fn, *args, **kwargs):
+        """Runs an export method on the export pool; returns a Future with its result."""
+        return self._pool.submit(fn, *args, **kwargs)
+
+    def watch(self, job, interval=POLL_INTERVAL):
+        """Yields the seconds elapsed until `job` finishes, so UI handlers poll it instead of blocking."""
+        started = time.monotonic()
+        while not job.done():
+            yield time.monotonic() - started
+            wait([job], timeout=interval)
+
+
+def _new_pdf():
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    pdf.set_title("DocSmith Answer Export")
+    pdf.set_author("DocSmith AI Assistant")
+    return pdf
+
+
+def _footer(pdf):
+    pdf.set_y(-20)
+    pdf.set_font("Arial", size=8)
+    pdf.cell(0, 10, strip_unsupported("Exported by DocSmith • Powered by offline synthesis"), align="C")
+
+
+exporter = ExportManager()
@@ -0,0 +1,171 @@
+# glossary_index.py
+import threading
+from collections import deque
+
+# ✅ Index settings
+SUGGEST_LIMIT = 10          # autocomplete choices returned
+FUZZY_MIN_LENGTH = 4        # shorter queries only get exact prefix matches
+FUZZY_DISTANCE = 1          # edits tolerated by fuzzy lookup
+PENDING_LIMIT = 256         # terms added since the last automaton build before it is rebuilt
+
+_TERMS = ""  # trie key holding the terms that end at a node
+
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+
+class GlossaryIndex:
+    """
+    Lookup structures over glossary terms for keystroke-rate autocomplete.
+
+    - A prefix trie over each term and every word-start suffix of it, so "market"
+      finds "digital marketing"; walked breadth first so shorter terms come first.
+    - Fuzzy prefix lookup (Levenshtein distance 1) over the same trie for typos.
+    - An Aho–Corasick automaton that finds every term contained in a text in one pass.
+
+    Terms are added incrementally. New terms go into the trie at once; the automaton is
+    rebuilt lazily, and terms added since its last build are matched directly until then.
+    """
+
+    def __init__(self, terms=()):
+        self._lock = threading.RLock()
+        self._trie = {}
+        self._terms = {}      # normalized term -> original term
+        self._pending = set()
+        self._automaton = None
+        for term in terms:
+            self.add(term)
+
+    def __len__(self):
+        return len(self._terms)
+
+    # ✅ Updates
+    def add(self, term):
+        key = normalize(term)
+        if not key:
+            return
+        with self._lock:
+            if key in self._terms:
+                return
+            self._terms[key] = term
+            words = key.split(" ")
+            for start in range(len(words)):
+                node = self._trie
+                for ch in " ".join(words[start:]):
+                    node = node.setdefault(ch, {})
+                node.setdefault(_TERMS, []).append(key)
+            self._pending.add(key)
+
+    # ✅ Autocomplete
+    def _collect(self, node, results, limit):
+        # Breadth first from a trie node: shortest completions first
+        queue = deque([node])
+        while queue and len(results) < limit:
+            current = queue.popleft()
+            for key in current.get(_TERMS, ()):
+                if key not in results:
+                    results[key] = None
+                    if len(results) >= limit:
+                        return
+            queue.extend(child for ch, child in current.items() if ch != _TERMS)
+
+    def prefix(self, text, limit=SUGGEST_LIMIT):
+        """Terms with a word that starts with `text`."""
+        query = normalize(text)
+        results = {}
+        with self._lock:
+            node = self._trie
+            for ch in query:
+                node = node.get(ch)
+                if node is None:
+                    return []
+            self._collect(node, results, limit)
+            return [self._terms[key] for key in results]
+
+    def fuzzy(self, text, limit=SUGGEST_LIMIT, max_distance=FUZZY_DISTANCE):
+        """Terms with a word starting within `max_distance` edits of `text`."""
+        query = normalize(text)
+        results = {}
+        first_row = list(range(len(query) + 1))
+        with self._lock:
+            stack = [(self._trie, first_row)]
+            while stack and len(results) < limit:
+                node, row = stack.pop()
+                if row[-1] <= max_distance:
+                    self._collect(node, results, limit)
+                    continue
+                for ch, child in node.items():
+                    if ch == _TERMS:
+                        continue
+                    next_row = [row[0] + 1]
+                    for i, query_ch in enumerate(query, start=1):
+                        next_row.append(min(next_row[i - 1] + 1, row[i] + 1, row[i - 1] + (query_ch != ch)))
+                    if min(next_row) <= max_distance:
+                        stack.append((child, next_row))
+            return [self._terms[key] for key in results]
+
+    def suggest(self, text, limit=SUGGEST_LIMIT):
+        """
+        Autocomplete for a question being typed: terms contained in it, then terms it
+        is a prefix of, then fuzzy matches for typos.
+        """
+        results = dict.fromkeys(self.find_in(text)[:limit])
+        for term in self.prefix(text, limit):
+            results.setdefault(term)
+        if len(results) < limit and len(normalize(text)) >= FUZZY_MIN_LENGTH:
+            for term in self.fuzzy(text, limit):
+                results.setdefault(term)
+        return list(results)[:limit]
+
+    # ✅ Aho–Corasick matching
+    def _build(self):
+        goto, fail, out = [{}], [0], [None]
+        for key in self._terms:
+            state = 0
+            for ch in key:
+                target = goto[state].get(ch)
+                if target is None:
+                    target = goto[state][ch] = len(goto)
+                    goto.append({})
+                    fail.append(0)
+                    out.append(None)
+                state = target
+            out[state] = key
+        # Output links skip straight to the next shorter term ending at the same position
+        link = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, target in goto[state].items():
+                queue.append(target)
+                fallback = fail[state]
+                while fallback and ch not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[target] = goto[fallback].get(ch, 0) if state else 0
+                link[target] = fail[target] if out[fail[target]] is not None else link[fail[target]]
+        self._automaton = (goto, fail, out, link)
+        self._pending = set()
+
+    def find_in(self, text):
+        """Every term occurring in `text` (case-insensitive)."""
+        haystack = normalize(text)
+        with self._lock:
+            if self._automaton is None or len(self._pending) > PENDING_LIMIT:
+                self._build()
+            goto, fail, out, link = self._automaton
+            pending = list(self._pending)
+        found = {}
+        state = 0
+        for ch in haystack:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            match = state if out[state] is not None else link[state]
+            while match:
+                found.setdefault(out[match], None)
+                match = link[match]
+        for key in pending:
+            if key in haystack:
+                found.setdefault(key, None)
+        return [self._terms[key] for key in found]
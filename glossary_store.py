@@ -0,0 +1,74 @@
+# glossary_store.py
+import os
+import json
+import tempfile
+import threading
+from glossary_index import GlossaryIndex
+
+
+class GlossaryStore:
+    """
+    Glossary shared by every session. Reads see a consistent snapshot and each
+    update rewrites glossary.json atomically (temp file + rename), so parallel
+    saves can't interleave or leave a half-written file behind.
+
+    `index` (built on first use) serves autocomplete and term matching; `set` keeps it current.
+    """
+
+    def __init__(self, path, terms=None):
+        self.path = path
+        self._terms = dict(terms or {})
+        self._lock = threading.Lock()
+        self._index = None
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls(path, json.load(f))
+        except FileNotFoundError:
+            print("⚠️ glossary.json not found. Glossary fallback disabled.")
+            return cls(path)
+
+    def get(self, term, default=None):
+        return self._terms.get(term, default)
+
+    def set(self, term, definition):
+        with self._lock:
+            self._terms[term] = definition
+            if self._index is not None:
+                self._index.add(term)
+            snapshot = dict(self._terms)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".glossary-", suffix=".json")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(snapshot, f, indent=2, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+
+    @property
+    def index(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    index = GlossaryIndex(self._terms)
+                    index.find_in("")  # builds the matching automaton up front
+                    self._index = index
+        return self._index
+
+    def to_json(self):
+        with self._lock:
+            return json.dumps(self._terms, indent=2, ensure_ascii=False)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._terms))
+
+    def __contains__(self, term):
+        return term in self._terms
+
+    def __len__(self):
+        return len(self._terms)
@@ -0,0 +1,126 @@
+# history_store.py
+import os
+import json
+import threading
+from datetime import datetime
+
+HISTORY_FILE = "query_history.jsonl"
+LEGACY_HISTORY_FILE = "query_history.json"
+HISTORY_TAIL = 50       # session entries shown in the History box
+HISTORY_PAGE_SIZE = 20  # session entries per History page
+
+
+def format_entries(entries):
+    return "\n".join(f"Q: {entry['question']}\nA: {entry['answer']}\n---" for entry in entries)
+
+
+def _decode(line):
+    # A crash during an append can leave a partial line behind: skipped rather than fatal
+    try:
+        return json.loads(line)
+    except ValueError:
+        print(f"[!] Skipped unreadable history line: {line[:80]!r}")
+        return None
+
+
+class HistoryStore:
+    """
+    Append-only JSONL query log. Each answer costs one appended line; the log is never
+    loaded whole, and `tail` reads only the end of the file.
+
+    Entry fields: timestamp, question, answer, model, latency_ms, sources.
+    """
+
+    def __init__(self, path=HISTORY_FILE, legacy_path=LEGACY_HISTORY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        if not os.path.exists(path) and legacy_path and os.path.exists(legacy_path):
+            self._migrate(legacy_path)
+        self._end_last_line()
+
+    def _migrate(self, legacy_path):
+        # The old format was a JSON list of "Q: ...\nA: ...\n---" strings
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            legacy = json.load(f)
+        with open(self.path, "w", encoding="utf-8") as f:
+            for item in legacy:
+                question, _, answer = item.removesuffix("\n---").partition("\nA: ")
+                entry = {"timestamp": None, "question": question.removeprefix("Q: "), "answer": answer,
+                         "model": None, "latency_ms": None, "sources": []}
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        print(f"[✓] Migrated {len(legacy)} history entries to {self.path}")
+
+    def _end_last_line(self):
+        # Entries appended after a partial line must not be glued onto it
+        if not os.path.exists(self.path) or not os.path.getsize(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+    def append(self, question, answer, model=None, latency_ms=None, sources=None):
+        entry = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "question": question,
+            "answer": answer,
+            "model": model,
+            "latency_ms": None if latency_ms is None else round(latency_ms, 1),
+            "sources": list(sources or []),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+        return entry
+
+    def _read_backwards(self, limit, block_size=1 << 16):
+        # Yields entries newest first, reading the file from the end in blocks
+        if not os.path.exists(self.path) or limit <= 0:
+            return []
+        entries = []
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            buffer = b""
+            while position > 0 and len(entries) < limit:
+                step = min(block_size, position)
+                position -= step
+                f.seek(position)
+                buffer = f.read(step) + buffer
+                lines = buffer.split(b"\n")
+                buffer = lines.pop(0)  # possibly incomplete first line
+                for line in reversed(lines):
+                    if not line.strip():
+                        continue
+                    entry = _decode(line)
+                    if entry is None:
+                        continue
+                    entries.append(entry)
+                    if len(entries) >= limit:
+                        break
+            if position == 0 and buffer.strip() and len(entries) < limit:
+                entry = _decode(buffer)
+                if entry is not None:
+                    entries.append(entry)
+        return entries
+
+    def tail(self, n=HISTORY_TAIL):
+        """Most recent n entries, oldest first."""
+        if n <= 0:
+            return []
+        with self._lock:
+            return list(reversed(self._read_backwards(n)))
+
+    def iter_entries(self):
+        """Streams every entry, oldest first."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = _decode(line) if line.strip() else None
+                if entry is not None:
+                    yield entry
+
+
+history = HistoryStore()
@@ -1,43 +1,46 @@
 import os
-import chromadb
-from sentence_transformers import SentenceTransformer
-from utils.file_loader import load_document
-from utils.chunker import chunk_text
-
-
-# Initialize ChromaDB client (new architecture)
-chroma_client = chromadb.PersistentClient(path="./embeddings")
-collection = chroma_client.get_or_create_collection(name="doc_chunks")
-
-# Load embedding model
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
-
-# Scan docs folder
-DOCS_DIR = "./docs"
-for filename in os.listdir(DOCS_DIR):
-    file_path = os.path.join(DOCS_DIR, filename)
-    try:
-        print(f"[+] Processing: {filename}")
-        text = load_document(file_path)
-
-        if not text.strip():
-            print(f"[!] Skipped empty file: {filename}")
-            continue
-
-        chunks = chunk_text(text)
-        print(f"[🔍] Found {len(chunks)} chunks in {filename}")
-
-        for i, chunk in enumerate(chunks):
-            chunk_id = f"{filename}_{i}"
-            embedding = embedder.encode(chunk).tolist()
-            collection.add(
-                documents=[chunk],
-                embeddings=[embedding],
-                ids=[chunk_id],
-                metadatas=[{"source": filename}]
-            )
-        print(f"[✓] Embedded {len(chunks)} chunks from {filename}")
-    except Exception as e:
-        print(f"[!] Failed to process {filename}: {e}")
-
-print("[✓] All documents embedded and saved.")
\ No newline at end of file
+import argparse
+from ingest_pipeline import ingest_paths, EMBED_BATCH_SIZE, WRITE_BATCH_SIZE, LOAD_WORKERS
+from resources import DEFAULT_LIBRARY
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed every document in ./docs into a library of the doc_chunks index.")
+    parser.add_argument("--docs", default="./docs", help="Folder to scan")
+    parser.add_argument("--library", default=DEFAULT_LIBRARY, help="Library (collection shard) to store the documents in")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Chunks per embedding batch")
+    parser.add_argument("--write-batch-size", type=int, default=WRITE_BATCH_SIZE, help="Chunks per Chroma upsert")
+    parser.add_argument("--workers", type=int, default=LOAD_WORKERS, help="Processes extracting document text")
+    parser.add_argument("--no-suggestions", action="store_true", help="Skip precomputing suggested questions")
+    args = parser.parse_args()
+
+    # Scan docs folder
+    docs_dir = args.docs
+    paths = [os.path.join(docs_dir, filename) for filename in sorted(os.listdir(docs_dir))]
+    paths = [path for path in paths if os.path.isfile(path)]
+    print(f"[+] Processing {len(paths)} file(s) from {docs_dir}")
+
+    result = ingest_paths(
+        paths,
+        batch_size=args.batch_size,
+        write_batch_size=args.write_batch_size,
+        load_workers=args.workers,
+        library=args.library
+    )
+
+    for filename, stat in result["file_stats"].items():
+        if not stat["skipped"]:
+            print(f"[✓] {filename}: {stat['chunks']} chunks, {stat['embedded']} embedded, {stat['deleted']} removed")
+
+    print(f"[✓] All documents embedded and saved: {result['chunks']} chunks in {result['seconds']:.1f}s "
+          f"({result['chunks_per_sec']:.1f} chunks/sec).")
+
+    # Topics and their suggested questions are precomputed here so the app can serve them instantly
+    if not args.no_suggestions and result["chunks"]:
+        from suggestions import suggestion_bank
+        suggestion_bank.refresh()
+
+
+# Guarded so extraction worker processes can import this module safely
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# ingest_jobs.py
+import os
+import json
+import queue
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from ingest_pipeline import ingest_paths
+from resources import normalize_library, DEFAULT_LIBRARY
+
+JOBS_DB = "./embeddings/ingest_jobs.sqlite3"
+UPLOADS_DIR = "./uploads"    # uploads are copied here so an interrupted job can resume
+POLL_INTERVAL = 0.5          # seconds between progress updates sent to the UI
+TERMINAL = ("done", "failed", "cancelled")
+
+
+def _empty_progress(files):
+    return {"files_total": len(files), "files_done": 0, "files_skipped": 0, "files_failed": 0,
+            "chunks_written": 0, "current": None, "file_stats": {}}
+
+
+class IngestJobs:
+    """
+    Background ingestion jobs persisted in SQLite.
+
+    Uploads are queued and run by worker threads through the ingest pipeline while
+    queries keep using the existing index. Progress is stored per file and per chunk.
+    Jobs can be cancelled, and jobs interrupted by a crash are re-queued by `start()`.
+    Re-running a job is cheap because files that were already committed are skipped
+    by their content hash.
+    """
+
+    def __init__(self, db_path=JOBS_DB, uploads_dir=UPLOADS_DIR, workers=1):
+        self.uploads_dir = uploads_dir
+        self.workers = workers
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, status TEXT NOT NULL, created REAL NOT NULL, updated REAL NOT NULL,
+                files TEXT NOT NULL, progress TEXT NOT NULL, error TEXT
+            )
+        """)
+        if "library" not in [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]:
+            self._conn.execute(f"ALTER TABLE jobs ADD COLUMN library TEXT NOT NULL DEFAULT '{DEFAULT_LIBRARY}'")
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._cancel = {}  # job id -> threading.Event
+        self._started = False
+
+    # ✅ Persistence
+    def _save(self, job_id, **fields):
+        fields["updated"] = time.time()
+        if "progress" in fields:
+            fields["progress"] = json.dumps(fields["progress"])
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", [*fields.values(), job_id])
+
+    def _transition(self, job_id, current, status):
+        # Compare-and-set, so a worker claiming a queued job and cancel() never both win
+        with self._lock, self._conn:
+            changed = self._conn.execute(
+                "UPDATE jobs SET status = ?, updated = ? WHERE id = ? AND status = ?",
+                (status, time.time(), job_id, current)
+            ).rowcount
+        return changed == 1
+
+    def status(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, created, updated, files, progress, error, library FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "status": row[1], "created": row[2], "updated": row[3],
+                "files": json.loads(row[4]), "progress": json.loads(row[5]), "error": row[6], "library": row[7]}
+
+    # ✅ Lifecycle
+    def start(self):
+        """Starts the workers and re-queues jobs left queued or running by a previous process."""
+        if self._started:
+            return
+        self._started = True
+        with self._lock:
+            pending = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created"
+            ).fetchall()
+        for (job_id,) in pending:
+            print(f"[↻] Resuming ingest job {job_id}")
+            self._save(job_id, status="queued")
+            self._queue.put(job_id)
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"ingest-job-{i}", daemon=True).start()
+
+    def submit(self, paths, library=DEFAULT_LIBRARY):
+        library = normalize_library(library)  # rejected here rather than when the job runs
+        self.start()  # before inserting, so resumption doesn't queue this job twice
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = os.path.join(self.uploads_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        files = []
+        try:
+            for i, path in enumerate(paths):
+                os.makedirs(os.path.join(job_dir, str(i)))
+                target = os.path.join(job_dir, str(i), os.path.basename(path))
+                shutil.copy2(path, target)  # keeps the modification date used by date filters
+                files.append(target)
+        except Exception:
+            self._discard_uploads(job_id)
+            raise
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, created, updated, files, progress, library) VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, now, now, json.dumps(files), json.dumps(_empty_progress(files)), library)
+            )
+        self._queue.put(job_id)
+        return job_id
+
+    def cancel(self, job_id):
+        job = self.status(job_id)
+        if job is None or job["status"] in TERMINAL:
+            return job
+        self._cancel.setdefault(job_id, threading.Event()).set()
+        # Only a job no worker has claimed yet is cancelled here; a running one stops itself
+        if self._transition(job_id, "queued", "cancelled"):
+            self._discard_uploads(job_id)
+        return self.status(job_id)
+
+    def _discard_uploads(self, job_id):
+        # Copies are only kept while the job may still (re)start
+        shutil.rmtree(os.path.join(self.uploads_dir, job_id), ignore_errors=True)
+
+    def watch(self, job_id, interval=POLL_INTERVAL):
+        """Yields the job's status until it reaches a terminal state."""
+        while True:
+            job = self.status(job_id)
+            yield job
+            if job is None or job["status"] in TERMINAL:
+                return
+            time.sleep(interval)
+
+    # ✅ Worker
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            if not self._transition(job_id, "queued", "running"):
+                self._cancel.pop(job_id, None)
+                continue
+            self._run(self.status(job_id))
+
+    def _run(self, job):
+        job_id = job["id"]
+        cancel = self._cancel.setdefault(job_id, threading.Event())
+        progress = _empty_progress(job["files"])
+        last_saved = [0.0]
+
+        def on_progress(event):
+            kind = event["event"]
+            if kind == "file_started":
+                progress["current"] = event["source"]
+            elif kind in ("file_done", "file_skipped"):
+                progress["files_done"] += 1
+                progress["files_skipped"] += kind == "file_skipped"
+                progress["file_stats"][event["source"]] = event.get("chunks", 0)
+                progress["current"] = None
+            elif kind == "file_failed":
+                progress["files_failed"] += 1
+            elif kind == "chunks_written":
+                progress["chunks_written"] = event["chunks"]
+            # File-level events are saved at once; chunk counts at most every POLL_INTERVAL
+            if kind != "chunks_written" or time.monotonic() - last_saved[0] >= POLL_INTERVAL:
+                last_saved[0] = time.monotonic()
+                self._save(job_id, progress=progress)
+
+        try:
+            result = ingest_paths(job["files"], progress=on_progress, cancel=cancel, library=job["library"])
+            status = "cancelled" if result["cancelled"] else "done"
+            self._save(job_id, status=status, progress=progress)
+        except Exception as e:
+            print(f"❌ Ingest job {job_id} failed: {e}")
+            self._save(job_id, status="failed", progress=progress, error=str(e))
+        finally:
+            self._cancel.pop(job_id, None)
+            # Done, cancelled and failed jobs are never resumed (a crash leaves the job running, uploads kept)
+            self._discard_uploads(job_id)
+
+
+def format_job_status(job):
+    if job is None:
+        return "⚠️ Unknown ingest job."
+    p = job["progress"]
+    icons = {"queued": "⏳", "running": "⚙️", "done": "✅", "failed": "❌", "cancelled": "🛑"}
+    line = (f"{icons.get(job['status'], '')} Job {job['id']} {job['status']}: "
+            f"{p['files_done']}/{p['files_total']} file(s), {p['chunks_written']} chunk(s) embedded")
+    if job["library"] != DEFAULT_LIBRARY:
+        line += f" in library '{job['library']}'"
+    if p["files_skipped"]:
+        line += f", {p['files_skipped']} unchanged"
+    if p["files_failed"]:
+        line += f", {p['files_failed']} failed"
+    if p["current"] and job["status"] == "running":
+        line += f"\n📄 Processing {p['current']}"
+    if job["error"]:
+        line += f"\n{job['error']}"
+    return line
+
+
+ingest_jobs = IngestJobs()
@@ -0,0 +1,419 @@
+# ingest_pipeline.py
+import os
+import hashlib
+import queue
+import threading
+import time
+from datetime import datetime
+from utils.file_loader import iter_document, iter_documents
+from utils.chunker import iter_chunk_spans
+from resources import get_embedder, get_collection, drop_collection, normalize_library, chunk_id_prefix, DEFAULT_LIBRARY
+from lexical_index import lexical_index
+from compact_index import compact_index
+
+# ✅ Pipeline tuning
+EMBED_BATCH_SIZE = 64     # chunks per model forward pass
+WRITE_BATCH_SIZE = 256    # chunks per Chroma upsert
+QUEUE_DEPTH = 8           # items buffered between stages
+LOAD_WORKERS = os.cpu_count() or 1  # processes extracting PDF/DOCX text
+
+_DONE = object()
+
+# One ingestion at a time: concurrent runs over the same source would race on its chunk ids
+_ingest_lock = threading.Lock()
+
+# ✅ Change listeners, called as fn(event, ids, documents, metadatas, embeddings) after each write
+#    event is "upsert" (new or changed chunks), "update" (metadata only; documents/embeddings are None)
+#    or "delete" (documents/metadatas/embeddings are None). Chunk ids are unique across libraries.
+_listeners = []
+
+
+def add_ingest_listener(fn):
+    _listeners.append(fn)
+
+
+# The BM25 index follows every write so lexical and vector search see the same chunks
+add_ingest_listener(lexical_index.on_ingest)
+if compact_index is not None:
+    add_ingest_listener(compact_index.on_ingest)
+
+
+def _notify(event, ids, documents=None, metadatas=None, embeddings=None):
+    for fn in _listeners:
+        try:
+            fn(event, ids, documents, metadatas, embeddings)
+        except Exception as e:
+            print(f"[!] Ingest listener failed: {e}")
+
+
+def _put(q, item, stop):
+    # Blocking put that gives up once another stage has failed
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop, cancel=None):
+    while not stop.is_set():
+        if cancel is not None and cancel.is_set():
+            stop.set()
+            break
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+# ✅ Content hashes
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_hash(chunk):
+    return hashlib.sha1(chunk.encode("utf-8")).hexdigest()
+
+
+# ✅ File completeness: one marker chunk per file instead of a check over every chunk
+def _completion_marker(collection, source, digest):
+    # The chunk a finished run stamped with the file hash (see commit in _ingest), if any.
+    # Documents stored before markers existed have none: re-committing them once backfills
+    # library and citation offset metadata without re-embedding anything.
+    found = collection.get(where={"$and": [{"source": source}, {"complete_hash": digest}]},
+                           include=["metadatas"], limit=1)
+    return found["metadatas"][0] if found["ids"] else None
+
+
+def _clear_markers(collection, source):
+    # A changed file is incomplete until its new version is committed, even if it later
+    # reverts to the hash of a stale marker that an interrupted run never reached
+    stale = collection.get(where={"$and": [{"source": source}, {"complete_hash": {"$ne": ""}}]},
+                           include=["metadatas"])
+    if stale["ids"]:
+        metadatas = [dict(meta, complete_hash="") for meta in stale["metadatas"]]
+        collection.update(ids=stale["ids"], metadatas=metadatas)
+        _notify("update", stale["ids"], None, metadatas)
+
+
+def _delete_orphans(collection, source, digest, page_size):
+    # Chunks of the file that this run did not write carry an older file hash, or predate
+    # completion markers (e.g. the numbered duplicates ids of older versions gave repeated chunks)
+    deleted = offset = 0
+    while True:
+        page = collection.get(where={"source": source}, include=["metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            return deleted
+        orphans = [chunk_id for chunk_id, meta in zip(page["ids"], page["metadatas"])
+                   if (meta or {}).get("file_hash") != digest or "complete_hash" not in meta]
+        if orphans:
+            collection.delete(ids=orphans)
+            _notify("delete", orphans)
+        offset += len(page["ids"]) - len(orphans)
+        deleted += len(orphans)
+
+
+def _file_metadata(path, library):
+    # Filterable fields shared by every chunk of a file; the date is the file's modification day
+    return {
+        "library": library,
+        "file_type": os.path.splitext(path)[1].lstrip(".").lower(),
+        "date": int(datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y%m%d")),
+    }
+
+
+# ✅ Stage 1: load + chunk (only changed chunks continue to the embedder)
+def _chunk_file(collection, source, segments, digest, file_meta, chunk_q, file_stats, stop,
+                lookup_size=WRITE_BATCH_SIZE):
+    # Chunks are looked up and queued in batches of lookup_size, so the state held per file
+    # stays bounded however many chunks it has
+    prefix = chunk_id_prefix(file_meta["library"])
+    paged = file_meta["file_type"] == "pdf"
+    batch = {}  # chunk id -> (chunk, meta)
+    count = embedded = 0
+    marker = None  # (id, metadata) of the first chunk, stamped complete by the commit
+
+    def send():
+        # Known ids keep their embedding and only get the new metadata
+        nonlocal embedded
+        known = set(collection.get(ids=list(batch), include=[])["ids"])
+        for chunk_id, (chunk, meta) in batch.items():
+            if chunk_id not in known:
+                if not _put(chunk_q, ("upsert", chunk_id, chunk, meta), stop):
+                    return False
+                embedded += 1
+        updates = [(chunk_id, meta) for chunk_id, (_, meta) in batch.items() if chunk_id in known]
+        batch.clear()
+        if updates:
+            return _put(chunk_q, ("update", [item[0] for item in updates], [item[1] for item in updates]), stop)
+        return True
+
+    for i, span in enumerate(iter_chunk_spans(segments)):
+        chunk = span["text"]
+        digest_c = chunk_hash(chunk)
+        # Content-addressed ids: an unchanged chunk keeps its id (and embedding) wherever it moves,
+        # and identical chunks of a file are stored once
+        chunk_id = f"{prefix}{source}_{digest_c[:16]}"
+        meta = {"source": source, **file_meta, "chunk_hash": digest_c, "chunk_index": i,
+                "char_start": span["char_start"], "char_end": span["char_end"],
+                "file_hash": digest, "complete_hash": ""}
+        if paged:
+            # Segments of a PDF are its pages; numbered from 1 for citations
+            meta.update(page_start=span["segment_start"] + 1, page_end=span["segment_end"] + 1)
+        if marker is None:
+            marker = (chunk_id, meta)
+        batch[chunk_id] = (chunk, meta)
+        count += 1
+        if len(batch) >= lookup_size and not send():
+            return False
+    if batch and not send():
+        return False
+
+    if not count:
+        print(f"[!] Skipped empty file: {source}")
+    file_stats[source] = {"chunks": count, "embedded": embedded, "deleted": 0, "skipped": False}
+    return _put(chunk_q, ("commit", source, digest, count, marker), stop)
+
+
+def _load_stage(files, collection, library, chunk_q, file_stats, load_workers, progress, stop):
+    # Hash first so unchanged files are never extracted
+    changed = []
+    for path, source in files:
+        if stop.is_set():
+            break
+        try:
+            digest = file_hash(path)
+            marker = _completion_marker(collection, source, digest)
+            file_meta = _file_metadata(path, library)
+            if marker is None:
+                _clear_markers(collection, source)
+        except Exception as e:
+            print(f"[!] Failed to process {source}: {e}")
+            progress({"event": "file_failed", "source": source, "error": str(e)})
+            continue
+        if marker is not None:
+            print(f"[=] Unchanged, skipped: {source}")
+            file_stats[source] = {"chunks": marker["chunk_count"], "embedded": 0, "deleted": 0, "skipped": True}
+            progress({"event": "file_skipped", "source": source, "chunks": marker["chunk_count"]})
+        else:
+            changed.append((path, source, digest, file_meta))
+    progress({"event": "planned", "files": len(files), "changed": len(changed)})
+
+    paths = [item[0] for item in changed]
+    if load_workers > 1 and paths:
+        documents = iter_documents(paths, max_workers=load_workers)
+    else:
+        documents = ((path, iter_document(path)) for path in paths)
+
+    for (_, segments), (path, source, digest, file_meta) in zip(documents, changed):
+        if stop.is_set():
+            break
+        print(f"[+] Processing: {source}")
+        progress({"event": "file_started", "source": source})
+        try:
+            if not _chunk_file(collection, source, segments, digest, file_meta, chunk_q, file_stats, stop):
+                break
+        except Exception as e:
+            print(f"[!] Failed to process {source}: {e}")
+            progress({"event": "file_failed", "source": source, "error": str(e)})
+    _put(chunk_q, _DONE, stop)
+
+
+# ✅ Stage 2: batched embedding
+def _embed_stage(chunk_q, embed_q, batch_size, stop):
+    batch = []
+    commits = []  # updates and commits, held back until the chunks queued before them are flushed
+
+    def flush():
+        if batch:
+            ids = [item[1] for item in batch]
+            documents = [item[2] for item in batch]
+            metadatas = [item[3] for item in batch]
+            embeddings = get_embedder().encode(documents, batch_size=batch_size, show_progress_bar=False).tolist()
+            batch.clear()
+            if not _put(embed_q, ("upsert", ids, documents, embeddings, metadatas), stop):
+                return False
+        while commits:
+            if not _put(embed_q, commits.pop(0), stop):
+                return False
+        return True
+
+    while True:
+        item = _get(chunk_q, stop)
+        if item is _DONE:
+            break
+        if item[0] != "upsert":
+            commits.append(item)
+            if not batch and not flush():
+                return
+            continue
+        batch.append(item)
+        if len(batch) >= batch_size and not flush():
+            return
+    if flush():
+        _put(embed_q, _DONE, stop)
+
+
+def _run_stage(target, errors, stop, *args):
+    try:
+        target(*args)
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+
+
+def _batches(values, size):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+# ✅ Stage 3: bulk upsert (runs on the calling thread)
+def ingest_paths(paths, source_fn=os.path.basename, batch_size=EMBED_BATCH_SIZE, write_batch_size=WRITE_BATCH_SIZE,
+                 load_workers=LOAD_WORKERS, progress=None, cancel=None, library=DEFAULT_LIBRARY):
+    """
+    Loads, chunks, embeds and stores documents as overlapping stages.
+    Unchanged files are skipped, only changed chunks are re-embedded and chunks
+    that disappeared from a file are deleted.
+
+    Parameters:
+        paths (list[str]): Files to ingest.
+        source_fn (callable): Maps a path to the `source` stored in metadata (default: the file name).
+        batch_size (int): Chunks per embedding forward pass.
+        write_batch_size (int): Chunks per Chroma upsert.
+        load_workers (int): Extraction processes; 1 loads in-process.
+        progress (callable): Receives event dicts: planned, file_skipped, file_started,
+            file_failed, chunks_written (running total) and file_done. Called from pipeline threads.
+        cancel (threading.Event): Stops the run once set. Files not yet committed are
+            left for the next run to pick up.
+        library (str): Library (collection shard) the documents belong to. Each chunk's
+            metadata also records its `library`, `file_type` and modification `date`.
+
+    Returns:
+        dict: `file_stats` (per source: chunks, embedded, deleted, skipped), `chunks` (embedded),
+        `seconds`, `chunks_per_sec` and `cancelled`.
+    """
+    library = normalize_library(library)
+    with _ingest_lock:
+        return _ingest(paths, source_fn, batch_size, write_batch_size, load_workers, progress, cancel, library)
+
+
+def _ingest(paths, source_fn, batch_size, write_batch_size, load_workers, progress, cancel, library):
+    progress = progress or (lambda event: None)
+    collection = get_collection(library)
+    files = [(path, source_fn(path)) for path in paths]
+    chunk_q = queue.Queue(maxsize=QUEUE_DEPTH * batch_size)
+    embed_q = queue.Queue(maxsize=QUEUE_DEPTH)
+    stop = threading.Event()
+    errors = []
+    file_stats = {}
+    started = time.perf_counter()
+
+    stages = [
+        threading.Thread(target=_run_stage, args=(_load_stage, errors, stop, files, collection, library, chunk_q, file_stats, load_workers, progress, stop), daemon=True),
+        threading.Thread(target=_run_stage, args=(_embed_stage, errors, stop, chunk_q, embed_q, batch_size, stop), daemon=True),
+    ]
+    for stage in stages:
+        stage.start()
+
+    pending = {"ids": [], "documents": [], "embeddings": [], "metadatas": []}
+
+    written = 0
+
+    def flush():
+        if pending["ids"]:
+            if len(set(pending["ids"])) < len(pending["ids"]):
+                # The same chunk queued twice before it was first written: one upsert, last one wins
+                keep = sorted({chunk_id: i for i, chunk_id in enumerate(pending["ids"])}.values())
+                for values in pending.values():
+                    values[:] = [values[i] for i in keep]
+            collection.upsert(**pending)
+            _notify("upsert", list(pending["ids"]), list(pending["documents"]), list(pending["metadatas"]),
+                    list(pending["embeddings"]))
+            for values in pending.values():
+                values.clear()
+            progress({"event": "chunks_written", "chunks": written})
+
+    def update(ids, metadatas):
+        collection.update(ids=ids, metadatas=metadatas)
+        _notify("update", ids, None, metadatas)
+
+    def commit(source, digest, count, marker):
+        flush()
+        file_stats[source]["deleted"] = _delete_orphans(collection, source, digest, write_batch_size)
+        if marker is not None:
+            # Written last, so an interrupted run is never mistaken for complete
+            marker_id, marker_meta = marker
+            update([marker_id], [dict(marker_meta, complete_hash=digest, chunk_count=count)])
+        progress(dict(file_stats.get(source, {}), event="file_done", source=source))
+
+    try:
+        while True:
+            item = _get(embed_q, stop, cancel)
+            if item is _DONE:
+                break
+            if item[0] == "commit":
+                commit(*item[1:])
+                continue
+            if item[0] == "update":
+                update(*item[1:])
+                continue
+            _, ids, documents, embeddings, metadatas = item
+            pending["ids"].extend(ids)
+            pending["documents"].extend(documents)
+            pending["embeddings"].extend(embeddings)
+            pending["metadatas"].extend(metadatas)
+            written += len(ids)
+            if len(pending["ids"]) >= write_batch_size:
+                flush()
+        cancelled = cancel is not None and cancel.is_set()
+        if not cancelled:
+            flush()
+    except Exception:
+        stop.set()
+        raise
+    finally:
+        for stage in stages:
+            stage.join()
+
+    if errors:
+        raise errors[0]
+
+    seconds = time.perf_counter() - started
+    return {
+        "file_stats": file_stats,
+        "chunks": written,
+        "seconds": seconds,
+        "chunks_per_sec": written / seconds if seconds else 0.0,
+        "cancelled": cancelled,
+    }
+
+
+def delete_library(library, page_size=WRITE_BATCH_SIZE):
+    """
+    Removes a library: its chunks leave every index (listeners see "delete" events) and
+    its Chroma collection is dropped. Other libraries are not touched.
+
+    Returns:
+        int: Number of chunks removed.
+    """
+    library = normalize_library(library)
+    with _ingest_lock:
+        collection = get_collection(library)
+        ids = []
+        while True:
+            page = collection.get(include=[], limit=page_size, offset=len(ids))
+            if not page["ids"]:
+                break
+            ids.extend(page["ids"])
+        for batch in _batches(ids, page_size):
+            _notify("delete", batch)
+        drop_collection(library)
+    print(f"[✓] Library '{library}' removed: {len(ids)} chunk(s)")
+    return len(ids)
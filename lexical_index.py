@@ -0,0 +1,196 @@
+# lexical_index.py
+import os
+import math
+import re
+import sqlite3
+import threading
+from resources import DEFAULT_LIBRARY, library_of
+
+LEXICAL_INDEX_PATH = "./embeddings/bm25.sqlite3"
+
+# ✅ BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN = re.compile(r"\w+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "was", "what", "with",
+}
+
+
+def tokenize(text):
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def is_exact_match(query, document):
+    """
+    True when the document contains every indexed term of the query, or one of its
+    distinctive terms: a code or number (any digit) or an acronym (all capitals).
+    A BM25 score alone is not enough, since common words like "how" or "work" score too.
+    """
+    terms = set(tokenize(query))
+    if not terms:
+        return False
+    found = terms & set(tokenize(document))
+    if found == terms:
+        return True
+    distinctive = {token.lower() for token in TOKEN.findall(query)
+                   if any(char.isdigit() for char in token) or (len(token) > 1 and token.isupper())}
+    return bool(found & distinctive)
+
+
+def _columns(doc_id, meta, library=None):
+    # The library comes from the metadata or the caller; the id is only a fallback guess
+    meta = meta or {}
+    return (meta.get("library") or library or library_of(doc_id), meta.get("source"), meta.get("file_type"),
+            meta.get("date"))
+
+
+# Filter key -> (column, SQL operator); values are pushed down into the search query
+_FILTER_COLUMNS = {
+    "libraries": ("d.library", "IN"),
+    "sources": ("d.source", "IN"),
+    "file_types": ("d.file_type", "IN"),
+    "date_from": ("d.date", ">="),
+    "date_to": ("d.date", "<="),
+}
+
+
+class LexicalIndex:
+    """
+    On-disk BM25 inverted index over the same chunk ids as the Chroma collections (all
+    libraries in one index). Each chunk's library, source, file type and date are stored
+    alongside, so search filters apply inside the query rather than afterwards.
+    Kept in sync incrementally by the ingest pipeline (see `on_ingest`).
+    """
+
+    def __init__(self, path=LEXICAL_INDEX_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(docs)")]
+        if columns and "library" not in columns:
+            # Index from before libraries and filters: dropped and rebuilt from Chroma on first search
+            self._conn.executescript("DROP TABLE IF EXISTS postings; DROP TABLE docs;")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS docs (
+                id TEXT PRIMARY KEY, length INTEGER NOT NULL,
+                library TEXT NOT NULL, source TEXT, file_type TEXT, date INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS docs_library ON docs (library);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL, doc_id TEXT NOT NULL, tf INTEGER NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+        """)
+        self._stats = None  # (doc count, average length), refreshed after writes
+
+    def _delete(self, ids):
+        rows = [(doc_id,) for doc_id in ids]
+        self._conn.executemany("DELETE FROM postings WHERE doc_id = ?", rows)
+        self._conn.executemany("DELETE FROM docs WHERE id = ?", rows)
+
+    def upsert(self, ids, documents, metadatas=None, library=None):
+        with self._lock, self._conn:
+            self._delete(ids)
+            for doc_id, document, meta in zip(ids, documents, metadatas or [None] * len(ids)):
+                tokens = tokenize(document)
+                counts = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                self._conn.execute(
+                    "INSERT INTO docs (id, length, library, source, file_type, date) VALUES (?, ?, ?, ?, ?, ?)",
+                    (doc_id, len(tokens), *_columns(doc_id, meta, library))
+                )
+                self._conn.executemany(
+                    "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                    [(term, doc_id, tf) for term, tf in counts.items()]
+                )
+            self._stats = None
+
+    def delete(self, ids):
+        with self._lock, self._conn:
+            self._delete(ids)
+            self._stats = None
+
+    def update(self, ids, metadatas):
+        # Metadata-only change (e.g. filter fields backfilled on re-ingest); postings stay as they are
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE docs SET library = ?, source = ?, file_type = ?, date = ? WHERE id = ?",
+                [(*_columns(doc_id, meta), doc_id) for doc_id, meta in zip(ids, metadatas)]
+            )
+
+    def on_ingest(self, event, ids, documents, metadatas, embeddings=None):
+        if event == "upsert":
+            self.upsert(ids, documents, metadatas)
+        elif event == "update":
+            self.update(ids, metadatas)
+        elif event == "delete":
+            self.delete(ids)
+
+    def count(self, library=None):
+        with self._lock:
+            if library is None:
+                return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM docs WHERE library = ?", (library,)).fetchone()[0]
+
+    def rebuild(self, collection, library=DEFAULT_LIBRARY, page_size=1000):
+        """Re-indexes every chunk stored in a library's collection (e.g. one ingested before this index existed)."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM postings WHERE doc_id IN (SELECT id FROM docs WHERE library = ?)", (library,))
+            self._conn.execute("DELETE FROM docs WHERE library = ?", (library,))
+        offset = 0
+        while True:
+            page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            self.upsert(page["ids"], page["documents"], page["metadatas"], library)
+            offset += len(page["ids"])
+        return offset
+
+    def search(self, query, limit=20, filters=None):
+        """
+        Returns [(chunk id, BM25 score)] for the best matching chunks, best first.
+        `filters` (see search.normalize_filters) restricts the chunks considered.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        marks = ",".join("?" * len(terms))
+        with self._lock:
+            if self._stats is None:
+                self._stats = self._conn.execute("SELECT COUNT(*), AVG(length) FROM docs").fetchone()
+            total, avg_length = self._stats
+            if not total:
+                return []
+            freqs = dict(self._conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({marks}) GROUP BY term", terms
+            ).fetchall())
+            conditions, params = [f"p.term IN ({marks})"], list(terms)
+            for key, value in (filters or {}).items():
+                column, operator = _FILTER_COLUMNS[key]
+                if operator == "IN":
+                    conditions.append(f"{column} IN ({','.join('?' * len(value))})")
+                    params.extend(value)
+                else:
+                    conditions.append(f"{column} {operator} ?")
+                    params.append(value)
+            rows = self._conn.execute(
+                f"SELECT p.doc_id, p.term, p.tf, d.length FROM postings p JOIN docs d ON d.id = p.doc_id "
+                f"WHERE {' AND '.join(conditions)}", params
+            ).fetchall()
+
+        idf = {term: math.log(1 + (total - df + 0.5) / (df + 0.5)) for term, df in freqs.items()}
+        scores = {}
+        for doc_id, term, tf, length in rows:
+            norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / (avg_length or 1))
+            scores[doc_id] = scores.get(doc_id, 0.0) + idf[term] * tf * (BM25_K1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+lexical_index = LexicalIndex()
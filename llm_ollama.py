@@ -1,6 +1,22 @@
-import requests
+from ollama_client import client
+from metrics import debug
 
-def synthesize_answer(question, context, model_name="gemma:2b"):
+# Appended to a streamed answer when generation fails part way through
+INCOMPLETE_NOTICE = "\n\n⚠️ Answer cut off: generation failed."
+
+
+def _record_usage(usage, data):
+    # Ollama reports token counts on the final response object
+    if usage is not None:
+        usage["prompt_tokens"] = data.get("prompt_eval_count", 0)
+        usage["completion_tokens"] = data.get("eval_count", 0)
+
+
+def build_prompt(question, context):
+    return f"Q: {question}\nContext: {context}\nA:"
+
+
+def synthesize_answer(question, context, model_name="gemma:2b", usage=None):
     """
     Synthesizes an answer using a locally running Ollama model.
     
@@ -8,26 +24,93 @@ def synthesize_answer(question, context, model_name="gemma:2b"):
         question (str): The user's question.
         context (str): The document chunk or context to answer from.
         model_name (str): The Ollama model tag (default: 'gemma:2b').
+        usage (dict): Optional; receives `prompt_tokens` and `completion_tokens`.
 
     Returns:
         str: The generated answer or an error message.
     """
     try:
-        prompt = f"Q: {question}\nContext: {context}\nA:"
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={"model": model_name, "prompt": prompt, "stream": False}
-        )
-        answer = response.json().get("response", "").strip()
+        prompt = build_prompt(question, context)
+        result = client.generate(model_name, prompt)
+        _record_usage(usage, result)
+        answer = result.get("response", "").strip()
         if not answer:
             print("⚠️ Gemma returned an empty response.")
             return "No answer generated."
 
-         # 🔍 Debug logging
-        print("🧠 Prompt sent to Gemma:\n", prompt)
-        print("🧠 Response from Gemma:\n", answer)
+        # 🔍 Debug logging
+        debug("🧠 Prompt sent to Gemma:\n", prompt)
+        debug("🧠 Response from Gemma:\n", answer)
         return answer
 
     except Exception as e:
         print(f"❌ Error in synthesis: {str(e)}")
-        return "Error"
\ No newline at end of file
+        return "Error"
+
+
+def stream_answer(question, context, model_name="gemma:2b", usage=None, status=None):
+    """
+    Streams an answer token by token from Ollama's NDJSON response.
+
+    Parameters:
+        question (str): The user's question.
+        context (str): The document chunk or context to answer from.
+        model_name (str): The Ollama model tag (default: 'gemma:2b').
+        usage (dict): Optional; receives `prompt_tokens` and `completion_tokens` once the stream ends.
+        status (dict): Optional; receives `complete` (True only if the model finished a non-empty
+            answer) and, if generation failed, `error`.
+
+    Yields:
+        str: Response fragments as they are generated, or an error message. A stream that fails
+        after some fragments ends with INCOMPLETE_NOTICE.
+    """
+    status = {} if status is None else status
+    status["complete"] = False
+    emitted = False
+    try:
+        prompt = build_prompt(question, context)
+        for data in client.stream(model_name, prompt):
+            if data.get("done"):
+                _record_usage(usage, data)
+            token = data.get("response", "")
+            if token:
+                emitted = True
+                yield token
+
+        if not emitted:
+            print("⚠️ Gemma returned an empty response.")
+            yield "No answer generated."
+        else:
+            status["complete"] = True
+
+    except Exception as e:
+        print(f"❌ Error in synthesis: {str(e)}")
+        status["error"] = str(e)
+        # Tokens already sent cannot be taken back: mark the answer as cut off instead
+        yield INCOMPLETE_NOTICE if emitted else "Error"
+
+
+def synthesize_answers(items, model_name="gemma:2b", usage=None):
+    """
+    Synthesizes answers for many (question, context) pairs concurrently, within the model's limit.
+
+    Parameters:
+        items (list[tuple[str, str]]): (question, context) pairs.
+        model_name (str): The Ollama model tag (default: 'gemma:2b').
+        usage (dict): Optional; receives the summed `prompt_tokens` and `completion_tokens`.
+
+    Returns:
+        list[str]: One answer (or error message) per pair, in input order.
+    """
+    prompts = [build_prompt(question, context) for question, context in items]
+    answers = []
+    for result in client.generate_many(model_name, prompts, return_exceptions=True):
+        if isinstance(result, Exception):
+            print(f"❌ Error in synthesis: {str(result)}")
+            answers.append("Error")
+            continue
+        if usage is not None:
+            usage["prompt_tokens"] = usage.get("prompt_tokens", 0) + result.get("prompt_eval_count", 0)
+            usage["completion_tokens"] = usage.get("completion_tokens", 0) + result.get("eval_count", 0)
+        answers.append(result.get("response", "").strip() or "No answer generated.")
+    return answers
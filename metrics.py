@@ -0,0 +1,154 @@
+# metrics.py
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ✅ Metrics settings
+VERBOSE = os.environ.get("DOCMENTOR_VERBOSE", "1") != "0"   # debug prints on hot paths
+METRICS_LOG = os.environ.get("DOCMENTOR_METRICS_LOG")       # JSONL file, one line per traced request
+METRICS_PORT = os.environ.get("DOCMENTOR_METRICS_PORT")     # serves GET /metrics when set
+SAMPLE_SIZE = 1024                                          # recent durations kept per span
+
+
+def set_verbose(enabled):
+    global VERBOSE
+    VERBOSE = bool(enabled)
+
+
+def debug(*args):
+    """print() that only runs when verbose output is switched on."""
+    if VERBOSE:
+        print(*args)
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class Trace:
+    """
+    Timings and counts for one request. Spans are timed with `with trace.span(name):`,
+    token counts and other facts go into `trace.fields`.
+    """
+
+    def __init__(self, name, **fields):
+        self.name = name
+        self.fields = dict(fields)
+        self.spans = {}
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def to_dict(self):
+        return {"trace": self.name, "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+                "spans_ms": {name: round(seconds * 1000, 2) for name, seconds in self.spans.items()},
+                **self.fields}
+
+
+class Metrics:
+    """
+    Aggregates finished traces: recent span durations (for p50/p95/p99), counters and
+    gauges registered by other modules, such as cache hit rates.
+    """
+
+    def __init__(self, log_path=METRICS_LOG, sample_size=SAMPLE_SIZE):
+        self.log_path = log_path
+        self.sample_size = sample_size
+        self._samples = {}   # span name -> deque of seconds
+        self._counters = {}
+        self._gauges = {}    # name -> callable returning a JSON-serializable value
+        self._lock = threading.Lock()
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.sample_size)).append(seconds)
+
+    def register_gauge(self, name, fn):
+        self._gauges[name] = fn
+
+    def record(self, trace):
+        """Adds a finished trace to the aggregates and appends it to the log sink, if configured."""
+        line = trace.to_dict()
+        self.observe(f"{trace.name}.total", line["total_ms"] / 1000)
+        for name, seconds in trace.spans.items():
+            self.observe(f"{trace.name}.{name}", seconds)
+        self.incr(f"{trace.name}.requests")
+        for name in ("prompt_tokens", "completion_tokens"):
+            if line.get(name):
+                self.incr(name, line[name])
+        if line.get("outcome"):
+            self.incr(f"{trace.name}.outcome.{line['outcome']}")
+        if self.log_path:
+            with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+        debug(f"[⏱] {trace.name}: {line['total_ms']} ms {line['spans_ms']}")
+
+    def snapshot(self):
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+            counters = dict(self._counters)
+        spans = {
+            name: {"n": len(values), "p50_ms": _percentile(values, 0.50) * 1000,
+                   "p95_ms": _percentile(values, 0.95) * 1000, "p99_ms": _percentile(values, 0.99) * 1000}
+            for name, values in samples.items() if values
+        }
+        gauges = {}
+        for name, fn in list(self._gauges.items()):
+            try:
+                gauges[name] = fn()
+            except Exception as e:
+                gauges[name] = f"unavailable: {e}"
+        return {"spans": spans, "counters": counters, "gauges": gauges}
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counters.clear()
+
+
+metrics = Metrics()
+
+
+# ✅ Optional metrics endpoint: GET /metrics returns the snapshot as JSON
+def serve_metrics(port=None, host="127.0.0.1"):
+    """Starts the endpoint on a background thread. Returns the server, or None when no port is set."""
+    port = port if port is not None else METRICS_PORT
+    if port in (None, ""):
+        return None
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = json.dumps(metrics.snapshot(), indent=2).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, int(port)), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"[✓] Metrics at http://{host}:{server.server_port}/metrics")
+    return server
@@ -0,0 +1,243 @@
+# ollama_client.py
+import os
+import json
+import time
+import asyncio
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+import requests
+from requests.adapters import HTTPAdapter
+
+# ✅ Client settings
+OLLAMA_URL = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+POOL_SIZE = 16                 # keep-alive connections to the Ollama server
+CONNECT_TIMEOUT = 5            # seconds
+READ_TIMEOUT = 120             # seconds without a byte from the server
+DEADLINE = 300                 # seconds for a whole request, including queueing
+MODEL_CONCURRENCY = {          # simultaneous generations per model
+    "gemma:2b": 1,
+    "phi3": 2,
+}
+DEFAULT_CONCURRENCY = 2
+
+
+class OllamaError(RuntimeError):
+    pass
+
+
+class OllamaTimeout(OllamaError):
+    pass
+
+
+class OllamaClient:
+    """
+    Pooled client for Ollama's /api/generate with per-model concurrency limits and deadlines.
+
+    Parameters:
+        base_url (str): Server address (default: $OLLAMA_HOST or http://localhost:11434).
+        pool_size (int): Keep-alive connections kept open.
+        concurrency (dict): Model tag -> maximum simultaneous requests.
+        deadline (float): Default seconds allowed per request, including time spent waiting for a slot.
+    """
+
+    def __init__(self, base_url=OLLAMA_URL, pool_size=POOL_SIZE, concurrency=None, deadline=DEADLINE,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = dict(MODEL_CONCURRENCY if concurrency is None else concurrency)
+        self.deadline = deadline
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._slots = {}
+        self._async_slots = weakref.WeakKeyDictionary()  # event loop -> {model: Semaphore}
+        self._in_flight = {}  # (model, prompt, options) -> Future shared by identical requests
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="ollama")
+
+    def _limit(self, model):
+        return self.concurrency.get(model, DEFAULT_CONCURRENCY)
+
+    def _slot(self, model):
+        with self._lock:
+            if model not in self._slots:
+                self._slots[model] = threading.BoundedSemaphore(self._limit(model))
+            return self._slots[model]
+
+    def _expires(self, deadline):
+        return time.monotonic() + (self.deadline if deadline is None else deadline)
+
+    @staticmethod
+    def _remaining(expires):
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            raise OllamaTimeout("Ollama request exceeded its deadline")
+        return remaining
+
+    def _acquire(self, model, expires):
+        slot = self._slot(model)
+        if not slot.acquire(timeout=self._remaining(expires)):
+            raise OllamaTimeout(f"No free slot for {model} before the deadline")
+        return slot
+
+    def _post(self, model, prompt, stream, expires, options):
+        payload = {"model": model, "prompt": prompt, "stream": stream}
+        if options:
+            payload["options"] = options
+        timeout = (self.connect_timeout, min(self.read_timeout, self._remaining(expires)))
+        try:
+            response = self.session.post(f"{self.base_url}/api/generate", json=payload, stream=stream, timeout=timeout)
+        except requests.Timeout as e:
+            raise OllamaTimeout(str(e)) from e
+        if response.status_code != 200:
+            response.close()
+            raise OllamaError(f"Ollama returned HTTP {response.status_code}: {response.text[:200]}")
+        return response
+
+    def _iter_stream(self, response, expires):
+        try:
+            for line in response.iter_lines():
+                self._remaining(expires)
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise OllamaError(data["error"])
+                yield data
+                if data.get("done"):
+                    break
+        except requests.Timeout as e:
+            raise OllamaTimeout(str(e)) from e
+        finally:
+            response.close()
+
+    # ✅ Blocking API
+    def generate(self, model, prompt, deadline=None, **options):
+        """
+        Returns Ollama's final response object (`response`, `prompt_eval_count`, `eval_count`, ...).
+        Identical requests already in flight share a single generation.
+        """
+        key = (model, prompt, json.dumps(options, sort_keys=True))
+        with self._lock:
+            shared = self._in_flight.get(key)
+            if shared is None:
+                owner = True
+                shared = self._in_flight[key] = Future()
+            else:
+                owner = False
+        if not owner:
+            try:
+                return shared.result(timeout=self._remaining(self._expires(deadline)))
+            except FutureTimeout as e:
+                raise OllamaTimeout("Ollama request exceeded its deadline while waiting for an identical request") from e
+        try:
+            expires = self._expires(deadline)
+            slot = self._acquire(model, expires)
+            try:
+                result = self._post(model, prompt, False, expires, options).json()
+            finally:
+                slot.release()
+            shared.set_result(result)
+            return result
+        except Exception as e:
+            shared.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def stream(self, model, prompt, deadline=None, **options):
+        """Yields Ollama's NDJSON objects as they arrive; the last one has `done` set."""
+        expires = self._expires(deadline)
+        slot = self._acquire(model, expires)
+        try:
+            yield from self._iter_stream(self._post(model, prompt, True, expires, options), expires)
+        finally:
+            slot.release()
+
+    def generate_many(self, model, prompts, deadline=None, return_exceptions=False, **options):
+        """
+        Runs several prompts concurrently within the model's limit; results keep input order.
+        With return_exceptions, a failed prompt yields its exception instead of failing the batch.
+        """
+        # A dedicated pool so a long batch never occupies the shared executor
+        with ThreadPoolExecutor(max_workers=self._limit(model)) as pool:
+            futures = [pool.submit(self.generate, model, prompt, deadline, **options) for prompt in prompts]
+            if not return_exceptions:
+                return [future.result() for future in futures]
+            return [future.exception() or future.result() for future in futures]
+
+    # ✅ asyncio API
+    def _async_slot(self, model):
+        # Waiting happens on the event loop, so a busy model never ties up executor threads.
+        # Keyed on the loop itself, so a closed loop's semaphores go with it.
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            slots = self._async_slots.setdefault(loop, {})
+            if model not in slots:
+                slots[model] = asyncio.Semaphore(self._limit(model))
+            return slots[model]
+
+    async def _async_acquire(self, model, expires):
+        slot = self._async_slot(model)
+        try:
+            await asyncio.wait_for(slot.acquire(), timeout=self._remaining(expires))
+        except asyncio.TimeoutError as e:
+            raise OllamaTimeout(f"No free slot for {model} before the deadline") from e
+        return slot
+
+    async def agenerate(self, model, prompt, deadline=None, **options):
+        expires = self._expires(deadline)
+        loop = asyncio.get_running_loop()
+        slot = await self._async_acquire(model, expires)
+        try:
+            remaining = self._remaining(expires)
+            call = loop.run_in_executor(self._executor, lambda: self.generate(model, prompt, remaining, **options))
+            try:
+                return await asyncio.wait_for(call, timeout=remaining)
+            except asyncio.TimeoutError as e:
+                raise OllamaTimeout("Ollama request exceeded its deadline") from e
+        finally:
+            slot.release()
+
+    async def astream(self, model, prompt, deadline=None, **options):
+        expires = self._expires(deadline)
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        done = object()
+        cancelled = threading.Event()
+
+        def pump():
+            try:
+                for data in self.stream(model, prompt, expires - time.monotonic(), **options):
+                    if cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, data)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        slot = await self._async_acquire(model, expires)
+        try:
+            loop.run_in_executor(self._executor, pump)
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+            slot.release()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+client = OllamaClient()
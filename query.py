@@ -1,56 +1,106 @@
-import chromadb
-from sentence_transformers import SentenceTransformer
-import ollama
+# query.py
+"""
+Command-line questions against the indexed documents, without the Gradio UI.
 
-# Load embedding model
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
+    python query.py "What is digital marketing?"
+    python query.py --input questions.jsonl --output answers.jsonl
+    python query.py "Q3 targets?" --library marketing --file-type pdf --since 2024-01-01
 
-# Initialize ChromaDB client (new architecture)
-chroma_client = chromadb.PersistentClient(path="./embeddings")
-collection = chroma_client.get_or_create_collection(name="doc_chunks")
+Input lines are JSON objects with a "question" field (plain text lines work too); any other
+fields, such as an id, are copied to the matching output line.
+"""
+import sys
+import json
+import argparse
+from retriever import answer_stream, answer_questions, MODEL_TAGS
+from query_embeddings import QUERY_BATCH_SIZE
 
-def ask_question(query, top_k=5):
-    print(f"\n[?] Question: {query}")
+DEFAULT_MODEL = "Phi3-mini (smart synthesis)"
 
-    # Embed the query
-    query_embedding = embedder.encode(query).tolist()
 
-    # Retrieve top-k relevant chunks
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=top_k
-    )
+def ask_question(query, model_name=DEFAULT_MODEL, show_explanation=False, filters=None):
+    print(f"\n[?] Question: {query}\n")
+    printed = 0
+    event = None
+    for event in answer_stream(query, model_name, show_explanation, filters):
+        # Print only the newly generated text
+        print(event["answer"][printed:], end="", flush=True)
+        printed = len(event["answer"])
+    print()
+    if event and event["sources"]:
+        print("\n[📄] Sources:")
+        for src in event["sources"]:
+            print(f"- {src}")
 
-    # Extract documents
-    retrieved_chunks = results['documents'][0]
-    sources = results['metadatas'][0]
 
-    # 🔍 Debug: Print retrieved chunks
-    print("\n[🔍] Retrieved Chunks:\n")
-    for chunk in retrieved_chunks:
-        print(chunk)
+def _read_questions(path):
+    records = []
+    with (sys.stdin if path == "-" else open(path, "r", encoding="utf-8")) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line) if line.startswith("{") else {"question": line}
+            records.append(record)
+    return records
 
-    # Combine chunks into context
-    context = "\n\n".join(retrieved_chunks)
 
-    # Send to Ollama
-    prompt = f"""You are a helpful assistant. Based on the following context, answer the question below.
+def answer_file(input_path, output_path, model_name=DEFAULT_MODEL, show_explanation=False,
+                batch_size=QUERY_BATCH_SIZE, filters=None):
+    """
+    Answers every question in a JSONL file, writing one JSON line per answer in input order.
 
-Context:
-{context}
+    Parameters:
+        input_path (str): JSONL questions, or "-" for stdin.
+        output_path (str): JSONL answers, or "-" for stdout.
+        model_name (str): Model name as shown in the UI.
+        show_explanation (bool): Ask the model to justify each answer.
+        batch_size (int): Questions embedded, retrieved and generated together.
+        filters (dict): Limits retrieval to some libraries, sources, file types or dates.
 
-Question:
-{query}
-"""
-    response = ollama.chat(model="tinyllama", messages=[{"role": "user", "content": prompt}])
-    answer = response['message']['content']
+    Returns:
+        int: Number of questions answered.
+    """
+    records = _read_questions(input_path)
+    out = sys.stdout if output_path == "-" else open(output_path, "w", encoding="utf-8")
+    try:
+        # Written batch by batch so a long run can be followed and partial output survives a crash
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            answers = answer_questions([record["question"] for record in batch], model_name,
+                                       show_explanation, batch_size=batch_size, filters=filters)
+            for record, answer in zip(batch, answers):
+                out.write(json.dumps(dict(record, **answer), ensure_ascii=False) + "\n")
+            out.flush()
+            print(f"[✓] {min(start + batch_size, len(records))}/{len(records)} answered", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ask questions about the indexed documents.")
+    parser.add_argument("question", nargs="?", help="A single question; prompted for when omitted")
+    parser.add_argument("--input", help="JSONL file of questions to answer in bulk ('-' for stdin)")
+    parser.add_argument("--output", default="-", help="JSONL file for bulk answers (default: stdout)")
+    parser.add_argument("--model", default=DEFAULT_MODEL, choices=sorted(MODEL_TAGS))
+    parser.add_argument("--explain", action="store_true", help="Ask the model to justify its answers")
+    parser.add_argument("--batch-size", type=int, default=QUERY_BATCH_SIZE)
+    parser.add_argument("--library", action="append", help="Only search this library (repeatable)")
+    parser.add_argument("--source", action="append", help="Only search this file name (repeatable)")
+    parser.add_argument("--file-type", action="append", help="Only search this file type, e.g. pdf (repeatable)")
+    parser.add_argument("--since", help="Only files modified on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--until", help="Only files modified on or before this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+    filters = {"libraries": args.library, "sources": args.source, "file_types": args.file_type,
+               "date_from": args.since, "date_to": args.until}
+
+    if args.input:
+        answer_file(args.input, args.output, args.model, args.explain, args.batch_size, filters)
+    else:
+        ask_question(args.question or input("Ask a question about your documents: "), args.model, args.explain, filters)
 
-    print("\n[✓] Answer:")
-    print(answer)
-    print("\n[📄] Sources:")
-    for src in sources:
-        print(f"- {src['source']}")
 
 if __name__ == "__main__":
-    user_query = input("Ask a question about your documents: ")
-    ask_question(user_query)
\ No newline at end of file
+    main()
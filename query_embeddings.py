@@ -0,0 +1,59 @@
+# query_embeddings.py
+import threading
+from utils.lru_cache import LRUCache
+from resources import get_embedder
+from metrics import metrics
+
+# ✅ Query embedding cache settings
+QUERY_CACHE_SIZE = 4096   # embeddings kept (about 1.5 KB each for MiniLM)
+QUERY_BATCH_SIZE = 64     # queries per model forward pass
+
+_cache = LRUCache(QUERY_CACHE_SIZE)
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def normalize_query(text):
+    # MiniLM's tokenizer is uncased, so case and spacing never change the embedding
+    return " ".join(text.lower().split())
+
+
+def _count(hits, misses):
+    with _stats_lock:
+        _stats["hits"] += hits
+        _stats["misses"] += misses
+
+
+def embed_queries(queries, batch_size=QUERY_BATCH_SIZE):
+    """
+    Embeds many queries, encoding only the ones not cached, in one batched call.
+
+    Parameters:
+        queries (list[str]): Query texts.
+        batch_size (int): Queries per model forward pass.
+
+    Returns:
+        list[list[float]]: One embedding per query, in input order.
+    """
+    keys = [normalize_query(query) for query in queries]
+    found = {key: _cache.get(key) for key in set(keys)}
+    missing = [key for key, embedding in found.items() if embedding is None]
+    if missing:
+        encoded = get_embedder().encode(missing, batch_size=batch_size, show_progress_bar=False).tolist()
+        for key, embedding in zip(missing, encoded):
+            _cache.put(key, embedding)
+            found[key] = embedding
+    _count(len(keys) - len(missing), len(missing))
+    return [found[key] for key in keys]
+
+
+def embed_query(query):
+    return embed_queries([query])[0]
+
+
+def hit_rate():
+    total = _stats["hits"] + _stats["misses"]
+    return _stats["hits"] / total if total else 0.0
+
+
+metrics.register_gauge("query_embedding_cache", lambda: dict(_stats, hit_rate=hit_rate(), size=len(_cache)))
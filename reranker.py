@@ -0,0 +1,78 @@
+# reranker.py
+import os
+import numpy as np
+from resources import get_reranker
+
+# ✅ Reranking settings
+RERANK_ENABLED = os.environ.get("DOCMENTOR_RERANK", "") == "1"
+RERANK_CANDIDATES = 20     # fused hits rescored per question (instead of the fixed top 5)
+RERANK_BATCH_SIZE = 32     # (question, chunk) pairs per cross-encoder forward pass
+MIN_K = 1                  # chunks always kept when the question is answered
+MAX_K = 5                  # chunks sent to the model at most
+SCORE_GAP = 0.25           # cut the list at the first drop at least this large
+RELATIVE_FLOOR = 0.3       # ... or where a chunk scores below this share of the best one
+MIN_CONFIDENCE = 0.1       # best score below this: not answerable from the documents
+
+
+def _probabilities(scores):
+    # The ms-marco cross-encoders return raw logits; one fixed sigmoid maps every score into
+    # 0..1, so a question's thresholds never depend on the other questions in the batch
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+    return 1.0 / (1.0 + np.exp(-scores))
+
+
+def adaptive_k(scores, min_k=MIN_K, max_k=MAX_K, gap=SCORE_GAP, floor=RELATIVE_FLOOR):
+    """
+    Number of top chunks to keep from scores sorted best first: stops at the first large
+    drop, or once scores fall well below the best one.
+    """
+    limit = min(max_k, len(scores))
+    for k in range(min_k, limit):
+        if scores[k - 1] - scores[k] >= gap or scores[k] < scores[0] * floor:
+            return k
+    return limit
+
+
+class Reranker:
+    """
+    Cross-encoder rescoring of the fused retrieval hits.
+
+    Retrieval over-fetches RERANK_CANDIDATES hits; every (question, chunk) pair is scored
+    in batches by a small local cross-encoder, and only the top chunks up to the first
+    large score gap are kept, so prompts get fewer, better chunks. Each kept hit carries
+    its `rerank` score, which the relevance gate uses instead of the raw vector distance.
+    """
+
+    def __init__(self, candidates=RERANK_CANDIDATES, batch_size=RERANK_BATCH_SIZE,
+                 min_confidence=MIN_CONFIDENCE):
+        self.candidates = candidates
+        self.batch_size = batch_size
+        self.min_confidence = min_confidence
+
+    def rerank_many(self, queries, hit_lists):
+        """
+        Reranks the hits of many questions with one batched cross-encoder call.
+
+        Returns:
+            list[list[dict]]: Per question, the kept hits best first, each with a `rerank` score.
+        """
+        pairs = [(query, hit["document"]) for query, hits in zip(queries, hit_lists) for hit in hits]
+        if not pairs:
+            return [[] for _ in hit_lists]
+        scores = _probabilities(get_reranker().predict(pairs, batch_size=self.batch_size, show_progress_bar=False))
+        results, offset = [], 0
+        for hits in hit_lists:
+            scored = sorted(zip(scores[offset:offset + len(hits)], range(len(hits))), reverse=True)
+            offset += len(hits)
+            ranked = [dict(hits[i], rerank=float(score)) for score, i in scored]
+            results.append(ranked[:adaptive_k([hit["rerank"] for hit in ranked])] if ranked else [])
+        return results
+
+    def rerank(self, query, hits):
+        return self.rerank_many([query], [hits])[0]
+
+    def is_confident(self, hits):
+        return bool(hits) and hits[0]["rerank"] >= self.min_confidence
+
+
+reranker = Reranker() if RERANK_ENABLED else None
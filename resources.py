@@ -0,0 +1,163 @@
+# resources.py
+import re
+import threading
+import time
+
+# ✅ Resource settings
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"   # only loaded when reranking is enabled; scores are logits
+CHROMA_PATH = "./embeddings"
+COLLECTION_NAME = "doc_chunks"
+GLOSSARY_FILE = "glossary.json"
+DEFAULT_LIBRARY = "default"           # stored in COLLECTION_NAME; other libraries get their own shard
+LIBRARY_NAME = re.compile(r"[a-z0-9][a-z0-9_-]{0,39}")
+
+_resources = {}
+_timings = {}  # step -> seconds, in the order they happened
+_lock = threading.RLock()
+
+
+def record_timing(step, seconds):
+    _timings[step] = seconds
+
+
+def _get(name, factory):
+    # Double-checked so concurrent first calls build the resource only once
+    if name not in _resources:
+        with _lock:
+            if name not in _resources:
+                started = time.perf_counter()
+                _resources[name] = factory()
+                record_timing(name, time.perf_counter() - started)
+    return _resources[name]
+
+
+def _load_embedder():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+
+def _load_reranker():
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(RERANKER_MODEL)
+
+
+def _load_chroma_client():
+    import chromadb
+    return chromadb.PersistentClient(path=CHROMA_PATH)
+
+
+def _load_glossary():
+    from glossary_store import GlossaryStore
+    return GlossaryStore.load(GLOSSARY_FILE)
+
+
+# ✅ Lazy accessors: nothing heavy is loaded until first use
+def get_embedder():
+    return _get("embedder", _load_embedder)
+
+
+def get_chroma_client():
+    return _get("chroma_client", _load_chroma_client)
+
+
+# ✅ Libraries: one Chroma collection (shard) per library
+def normalize_library(name):
+    library = (name or DEFAULT_LIBRARY).strip().lower()
+    if not LIBRARY_NAME.fullmatch(library):
+        raise ValueError(f"Invalid library name {name!r}: use up to 40 letters, digits, '-' or '_'")
+    return library
+
+
+def collection_name(library):
+    return COLLECTION_NAME if library == DEFAULT_LIBRARY else f"{COLLECTION_NAME}__{library}"
+
+
+def chunk_id_prefix(library):
+    # Chunk ids stay unique across shards; the default library keeps its original ids
+    return "" if library == DEFAULT_LIBRARY else f"{library}/"
+
+
+def library_of(chunk_id):
+    """
+    Best guess of a chunk's library from its id, for when the metadata is not at hand.
+    Ids from older uploads may hold whole paths ("/tmp/gradio/.../x.pdf_0"), so only a
+    valid library name before the first "/" counts; anything else is the default library.
+    """
+    prefix, separator, _ = chunk_id.partition("/")
+    if separator and prefix != DEFAULT_LIBRARY and LIBRARY_NAME.fullmatch(prefix):
+        return prefix
+    return DEFAULT_LIBRARY
+
+
+def _load_libraries():
+    prefix = f"{COLLECTION_NAME}__"
+    names = [getattr(item, "name", item) for item in get_chroma_client().list_collections()]
+    return {DEFAULT_LIBRARY} | {name[len(prefix):] for name in names if name.startswith(prefix)}
+
+
+def list_libraries():
+    return sorted(_get("libraries", _load_libraries))
+
+
+def get_collection(library=DEFAULT_LIBRARY):
+    if library == DEFAULT_LIBRARY:
+        return _get("collection", lambda: get_chroma_client().get_or_create_collection(name=COLLECTION_NAME))
+
+    def create():
+        collection = get_chroma_client().get_or_create_collection(name=collection_name(library))
+        _get("libraries", _load_libraries).add(library)
+        return collection
+
+    return _get(f"collection:{library}", create)
+
+
+def drop_collection(library):
+    """Deletes a library's shard; the default library is recreated empty on next use."""
+    with _lock:
+        try:
+            get_chroma_client().delete_collection(name=collection_name(library))
+        except Exception:
+            pass  # never created
+        _resources.pop("collection" if library == DEFAULT_LIBRARY else f"collection:{library}", None)
+        if library != DEFAULT_LIBRARY:
+            _get("libraries", _load_libraries).discard(library)
+
+
+def get_glossary():
+    return _get("glossary", _load_glossary)
+
+
+def get_reranker():
+    return _get("reranker", _load_reranker)
+
+
+def warm_up(background=True):
+    """
+    Loads the glossary (and its lookup index), Chroma collection, embedding model and, when enabled,
+    the reranker ahead of the first request.
+    In the background by default, so the UI can come up immediately.
+    """
+    def load_all():
+        try:
+            get_glossary().index
+            get_collection()
+            get_embedder()
+            from reranker import reranker
+            if reranker is not None:
+                get_reranker()
+            print(startup_report())
+        except Exception as e:
+            print(f"⚠️ Warm-up failed: {e}")
+
+    if not background:
+        load_all()
+        return None
+    thread = threading.Thread(target=load_all, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def startup_report():
+    lines = [f"- {step}: {seconds * 1000:.0f} ms" for step, seconds in list(_timings.items())]
+    return "[⏱] Startup timings:\n" + "\n".join(lines)
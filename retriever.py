@@ -1,23 +1,17 @@
-import os
+import time
 import json
-from datetime import datetime
-from fpdf import FPDF
-from utils.file_loader import load_document
-from utils.chunker import chunk_text
-from embedder import embedder, chroma_client, collection
-from llm_ollama import synthesize_answer
-
-# ✅ Utility: Strip unsupported characters for PDF
-def strip_unsupported(text):
-    return ''.join(c for c in text if ord(c) < 256)
-
-# ✅ Load glossary safely
-try:
-    with open("glossary.json", "r", encoding="utf-8") as f:
-        glossary = json.load(f)
-except FileNotFoundError:
-    print("⚠️ glossary.json not found. Glossary fallback disabled.")
-    glossary = {}
+from resources import get_glossary
+from ingest_pipeline import add_ingest_listener
+from llm_ollama import stream_answer, synthesize_answers
+from answer_cache import answer_cache
+from search import hybrid_search_many, normalize_filters
+from lexical_index import is_exact_match
+from reranker import reranker
+from query_embeddings import embed_query, embed_queries, QUERY_BATCH_SIZE
+from utils.context_packer import pack_context
+from history_store import history, format_entries, HISTORY_TAIL
+from suggestions import suggestion_bank
+from metrics import Trace, metrics, debug
 
 # ✅ Model tags
 MODEL_TAGS = {
@@ -26,179 +20,297 @@ MODEL_TAGS = {
     "MiniLM (fast retrieval)": "minilm"
 }
 
-# ✅ State trackers
-query_log = []
-file_stats = {}
+TOP_K = 5   # chunks retrieved per question when reranking is off
+SESSION_HISTORY_LIMIT = 200   # entries kept per UI session
 
-# ✅ Chunk stats viewer
-def show_chunk_stats():
-    return "**📊 Chunk Stats:**\n" + "\n".join([f"- `{name}` → {count} chunks" for name, count in file_stats.items()])
+# ✅ Prompt context budget per model tag (estimated tokens)
+CONTEXT_BUDGETS = {
+    "gemma:2b": 1200,
+    "phi3": 1500,
+}
+DEFAULT_CONTEXT_BUDGET = 1200
 
-# ✅ File ingestion
-def ingest_files(files):
-    total_chunks = 0
-    for file in files:
-        text = load_document(file.name)
-        if not text.strip():
-            continue
-        chunks = chunk_text(text)
-        print("Sample chunk:", chunks[0])
-        total_chunks += len(chunks)
-        file_stats[file.name] = len(chunks)
-
-        for i, chunk in enumerate(chunks):
-            chunk_id = f"{file.name}_{i}"
-            embedding = embedder.encode(chunk).tolist()
-            collection.add(
-                documents=[chunk],
-                embeddings=[embedding],
-                ids=[chunk_id],
-                metadatas=[{"source": file.name}]
-            )
-
-    print("[✓] Collection persisted successfully.")
-    print(f"[✓] Embedded {total_chunks} chunks from {len(files)} file(s).")
-    return f"✅ Embedded {total_chunks} chunks from {len(files)} file(s)."
-
-# ✅ Persistent query history
-HISTORY_FILE = "query_history.json"
-query_log = []
-
-# ✅ Load history on startup
-if os.path.exists(HISTORY_FILE):
-    with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-        query_log = json.load(f)
-
-def save_history():
-    with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(query_log, f, indent=2, ensure_ascii=False)
-
-# ✅ Question answering with overview and full context split
-def ask_question(query, show_chunks, model_name, show_explanation=False):
-    query_embedding = embedder.encode(query).tolist()
-    results = collection.query(query_embeddings=[query_embedding], n_results=5)
-    chunks = results['documents'][0]
-    sources = results['metadatas'][0]
-    distances = results['distances'][0]
-
-    print("🔍 Retrieved chunks:")
-    for chunk in chunks:
-        print("-", chunk[:100])
+# ✅ Cached answers are dropped whenever one of their chunks is re-ingested
+add_ingest_listener(lambda event, ids, *rest: answer_cache.invalidate(ids))
 
-    best_score = distances[0] if distances else 1.0
-    term = query.lower().strip()
-    glossary_hint = glossary.get(term)
+# ✅ Suggested questions are re-clustered shortly after each ingest
+add_ingest_listener(suggestion_bank.on_ingest)
 
-    if best_score > 0.85:
-        if glossary_hint:
-            query_log.append(f"Q: {query}\nA: {glossary_hint} (from glossary)\n---")
-            return glossary_hint, "**ℹ️ Answer from glossary.**", "", "\n".join(query_log)
-        else:
-            query_log.append(f"Q: {query}\nA: No relevant info found.\n---")
-            save_history()
-            return "No relevant info found in documents or glossary.", "", "", "\n".join(query_log)
+# ✅ Chunk stats viewer (stats are per session, kept in gr.State by the app)
+def show_chunk_stats(file_stats):
+    return "**📊 Chunk Stats:**\n" + "\n".join([f"- `{name}` → {count} chunks" for name, count in file_stats.items()])
 
-    context = "\n\n".join(chunks)
-    source_files = ", ".join(set([meta['source'] for meta in sources]))
+# ✅ Question answering with overview and full context split (streams the answer as it is generated)
+def ask_question(query, show_chunks, model_name, show_explanation=False, filters=None, session_history=None):
+    """
+    Answers a question from the indexed documents, yielding (answer, overview, full context, history)
+    for the UI as the answer streams in. See `answer_stream` for the underlying events.
+
+    `session_history` is the list of this session's entries: the finished answer is appended
+    to it and the rendered history shows only those, never other users' questions (the shared
+    log on disk still records every answer).
+    """
+    session_history = [] if session_history is None else session_history
+    for event in answer_stream(query, model_name, show_explanation, filters):
+        if event["outcome"] == "glossary":
+            overview = "**ℹ️ Answer from glossary.**"
+        else:
+            overview = f"**📄 Sources:** {', '.join(event['sources'])}" if show_chunks and event["sources"] else ""
+        full_context = f"{overview}\n\n---\n{event['context']}" if show_chunks and event["context"] else ""
+        if event["done"]:
+            session_history.append({"question": query, "answer": event["answer"]})
+            del session_history[:-SESSION_HISTORY_LIMIT]
+        yield event["answer"], overview, full_context, format_entries(session_history[-HISTORY_TAIL:])
+
+def answer_stream(query, model_name, show_explanation=False, filters=None):
+    """
+    Answers a question from the indexed documents as a stream of events.
+    `filters` limits retrieval to some libraries, sources, file types or dates (see search.normalize_filters).
+
+    Every event is a dict with `answer` (the text so far), `sources`, `context`, `outcome`
+    (generated, cache_similar, cache_exact, glossary, no_match, retrieval_only or error) and `done`.
+    The last event has `done` set and the complete answer, which is also logged to the history.
+    Answers cut off by a generation error (outcome `error`) are never cached.
+    Each call is traced: embed-query, cache-lookup, vector-search, context-build,
+    llm-first-token and llm-generation timings plus token counts go to `metrics`.
+    """
+    filters = normalize_filters(filters)
+    trace = Trace("ask", model=MODEL_TAGS.get(model_name, "gemma:2b"))
+    if filters:
+        trace.fields["filters"] = filters
+    try:
+        yield from _answer(query, model_name, show_explanation, filters, trace)
+    finally:
+        metrics.record(trace)
+
+def _event(answer, outcome, done, sources="", context=""):
+    return {"answer": answer, "sources": sources.split(", ") if sources else [], "context": context,
+            "outcome": outcome, "done": done}
+
+def _answer(query, model_name, show_explanation, filters, trace):
+    started = time.perf_counter()
+    with trace.span("embed-query"):
+        query_embedding = embed_query(query)
+    term = query.lower().strip()
+    glossary_hint = get_glossary().get(term)
     model_tag = MODEL_TAGS.get(model_name, "gemma:2b")
+    use_llm = model_name != "MiniLM (fast retrieval)"
+    variant = (show_explanation, glossary_hint, _scope(filters))
+
+    # ⚡ Near-duplicate question: answer without retrieval or generation
+    with trace.span("cache-lookup"):
+        cached = answer_cache.lookup(model_tag, variant, query_embedding) if use_llm else None
+    if cached:
+        debug("⚡ Answer cache hit (similar question)")
+        trace.fields["outcome"] = "cache_similar"
+        yield _cached_answer(query, cached, "cache_similar", model_tag, started)
+        return
+
+    hits = _retrieve([query], [query_embedding], filters, trace)[0]
+    chunks = [hit['document'] for hit in hits]
+    chunk_ids = [hit['id'] for hit in hits]
+
+    debug("🔍 Retrieved chunks:")
+    for chunk in chunks:
+        debug("-", chunk[:100])
 
+    if not _is_relevant(query, hits):
+        trace.fields["outcome"] = "glossary" if glossary_hint else "no_match"
+        if glossary_hint:
+            _log_answer(query, f"{glossary_hint} (from glossary)", "glossary", started)
+            yield _event(glossary_hint, "glossary", True)
+        else:
+            _log_answer(query, "No relevant info found.", model_tag, started)
+            yield _event("No relevant info found in documents or glossary.", "no_match", True)
+        return
+
+    with trace.span("context-build"):
+        packed, context, source_files = _build_context(hits, model_tag)
+    trace.fields["context_chunks"] = len(packed)
+
+    # ⚡ Same question, model, prompt variant and retrieved chunks: reuse the answer
+    with trace.span("cache-lookup"):
+        cached = answer_cache.get(model_tag, variant, query, chunk_ids) if use_llm else None
+    if cached:
+        debug("⚡ Answer cache hit (same chunks)")
+        trace.fields["outcome"] = "cache_exact"
+        yield _cached_answer(query, cached, "cache_exact", model_tag, started)
+        return
+
+    question = _prompt_question(query, term, glossary_hint, show_explanation)
+
+    if not use_llm:
+        outcome = "retrieval_only"
+        answer = chunks[0]
+    else:
+        outcome = "generated"
+        answer = ""
+        usage, status = {}, {}
+        generation_started = time.perf_counter()
+        for token in stream_answer(question, context, model_tag, usage=usage, status=status):
+            if not answer:
+                trace.add("llm-first-token", time.perf_counter() - generation_started)
+            answer += token
+            yield _event(answer, outcome, False, source_files, context)
+        trace.add("llm-generation", time.perf_counter() - generation_started)
+        trace.fields.update(usage)
+        answer = answer.strip()
+        if "error" in status:
+            outcome = "error"
+        if status["complete"]:
+            answer_cache.put(model_tag, variant, query, chunk_ids, query_embedding,
+                             answer=answer, context=context, source_files=source_files)
+    trace.fields["outcome"] = outcome
+
+    _log_answer(query, answer, model_tag, started, source_files.split(", "))
+    yield _event(answer, outcome, True, source_files, context)
+
+def _scope(filters):
+    # Part of the answer cache key: an answer is only reused for questions over the same scope
+    return json.dumps(filters, sort_keys=True) if filters else None
+
+def _retrieve(queries, embeddings, filters, trace):
+    # Fixed top 5 by fused rank, or an over-fetch narrowed by the cross-encoder when reranking is on
+    with trace.span("vector-search"):
+        hit_lists = hybrid_search_many(queries, embeddings, top_k=reranker.candidates if reranker else TOP_K,
+                                       filters=filters)
+    if reranker is None:
+        return hit_lists
+    with trace.span("rerank"):
+        hit_lists = reranker.rerank_many(queries, hit_lists)
+    trace.fields["rerank_k"] = sum(len(hits) for hits in hit_lists)  # chunks kept, over all questions
+    return hit_lists
+
+def _is_relevant(query, hits):
+    if reranker is not None:
+        # Low cross-encoder confidence: skip generation rather than answer from weak chunks
+        return reranker.is_confident(hits)
+    # Something close semantically, or a real exact match (a BM25 score alone only ranks)
+    distances = [hit['distance'] for hit in hits if hit['distance'] is not None]
+    best_score = min(distances) if distances else 1.0
+    exact_match = any(hit['lexical'] > 0 and is_exact_match(query, hit['document']) for hit in hits)
+    return best_score <= 0.85 or exact_match
+
+def _citation(metadata):
+    # "manual.pdf (p. 12-13)" for PDF chunks, the bare file name otherwise
+    if "page_start" not in metadata:
+        return metadata['source']
+    start, end = metadata['page_start'], metadata['page_end']
+    return f"{metadata['source']} (p. {start if start == end else f'{start}-{end}'})"
+
+def _build_context(hits, model_tag):
+    # Deduplicate overlapping chunks and fit them to the model's prompt budget
+    packed = pack_context(hits, CONTEXT_BUDGETS.get(model_tag, DEFAULT_CONTEXT_BUDGET))
+    context = "\n\n".join(piece['text'] for piece in packed)
+    source_files = ", ".join(dict.fromkeys(_citation(piece['metadata']) for piece in packed))
+    return packed, context, source_files
+
+def _prompt_question(query, term, glossary_hint, show_explanation):
     glossary_note = f"\n\nGlossary definition:\n{term}: {glossary_hint}" if glossary_hint else ""
     explanation_note = "\n\nExplain why this answer is correct." if show_explanation else ""
-    prompt = f"{query}{glossary_note}\n\nContext:\n{context}{explanation_note}"
-
-    answer = chunks[0] if model_name == "MiniLM (fast retrieval)" else synthesize_answer(prompt, context, model_tag)
-
-    overview = f"**📄 Sources:** {source_files}" if show_chunks else ""
-    full_context = f"{overview}\n\n---\n{context}" if show_chunks else ""
-
-    query_log.append(f"Q: {query}\nA: {answer}\n---")
-    save_history()
-    history_text = "\n".join(query_log)
-    return answer, overview, full_context, history_text
-
-# ✅ PDF export with citation footer toggle
-def export_answer_to_pdf(question, answer, context, sources=None, model_name=None, include_citations=False):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    pdf.set_title("DocSmith Answer Export")
-    pdf.set_author("DocSmith AI Assistant")
-
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    content = f"""Generated on: {timestamp}
-Model: {model_name}
-Sources: {sources}
-
-Question:
-{question}
-
-Answer:
-{answer}
-
-Context:
-{context}
-"""
-    pdf.multi_cell(0, 10, strip_unsupported(content))
-
-    if include_citations and sources:
-        pdf.set_y(-30)
-        pdf.set_font("Arial", size=10)
-        pdf.multi_cell(0, 10, strip_unsupported(f"Sources: {sources}"))
-
-    pdf.set_y(-20)
-    pdf.set_font("Arial", size=8)
-    pdf.cell(0, 10, strip_unsupported("Exported by DocSmith • Powered by offline synthesis"), align="C")
-
-    filename = f"answer_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    filepath = os.path.abspath(filename)
-    pdf.output(filepath)
-    print(f"[✓] PDF saved to: {filepath}")
-    print("[✓] File exists:", os.path.exists(filepath))
-    return filepath
-
-# ✅ TXT export with optional citation footer
-def save_answer_to_file(answer, sources=None):
-    filename = f"answer_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-    filepath = os.path.abspath(filename)
-    if sources:
-        answer += f"\n\nSources: {sources}"
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(answer)
-    print(f"[✓] TXT saved to: {filepath}")
-    return filepath
-
-# ✅ Suggested questions with style and glossary awareness
+    # The context is sent once, by the prompt template in llm_ollama
+    return f"{query}{glossary_note}{explanation_note}"
+
+def _cached_answer(query, cached, outcome, model_tag, started):
+    _log_answer(query, cached['answer'], model_tag, started, cached['source_files'].split(", "))
+    return _event(cached['answer'], outcome, True, cached['source_files'], cached['context'])
+
+# ✅ Bulk question answering (offline QA / evaluation): batched embedding, retrieval and generation
+def answer_questions(queries, model_name="Phi3-mini (smart synthesis)", show_explanation=False,
+                     batch_size=QUERY_BATCH_SIZE, filters=None):
+    """
+    Answers many questions without streaming or writing to the history.
+
+    Each batch embeds its queries in one forward pass, retrieves with a single multi-query
+    Chroma call and generates the remaining answers concurrently within the model's limit.
+    Answers go through the same cache and relevance gate as ask_question.
+
+    Parameters:
+        queries (list[str]): Questions to answer.
+        model_name (str): Model name as shown in the UI.
+        show_explanation (bool): Ask the model to justify each answer.
+        batch_size (int): Questions embedded and retrieved together.
+        filters (dict): Limits retrieval to some libraries, sources, file types or dates.
+
+    Returns:
+        list[dict]: Per question, in input order: `question`, `answer`, `sources` and
+        `outcome` (generated, cache_similar, cache_exact, glossary, no_match or retrieval_only).
+    """
+    filters = normalize_filters(filters)
+    results = []
+    for start in range(0, len(queries), batch_size):
+        results.extend(_answer_batch(queries[start:start + batch_size], model_name, show_explanation, filters))
+    return results
+
+def _answer_batch(queries, model_name, show_explanation, filters):
+    model_tag = MODEL_TAGS.get(model_name, "gemma:2b")
+    use_llm = model_name != "MiniLM (fast retrieval)"
+    trace = Trace("ask_batch", model=model_tag, questions=len(queries))
+    results = [None] * len(queries)
+    with trace.span("embed-query"):
+        embeddings = embed_queries(queries)
+
+    glossary = get_glossary()
+    variants = []
+    for query in queries:
+        variants.append((show_explanation, glossary.get(query.lower().strip()), _scope(filters)))
+
+    def cached_result(i, cached, outcome):
+        results[i] = {"question": queries[i], "answer": cached['answer'],
+                      "sources": cached['source_files'].split(", "), "outcome": outcome}
+
+    # ⚡ Near-duplicate questions skip retrieval too
+    with trace.span("cache-lookup"):
+        for i, query in enumerate(queries):
+            cached = answer_cache.lookup(model_tag, variants[i], embeddings[i]) if use_llm else None
+            if cached:
+                cached_result(i, cached, "cache_similar")
+    pending = [i for i in range(len(queries)) if results[i] is None]
+
+    hit_lists = _retrieve([queries[i] for i in pending], [embeddings[i] for i in pending], filters, trace)
+
+    to_generate = []  # (index, chunk ids, context, source files, prompt question)
+    for i, hits in zip(pending, hit_lists):
+        query = queries[i]
+        glossary_hint = variants[i][1]
+        if not _is_relevant(query, hits):
+            answer, outcome = ("No relevant info found.", "no_match") if not glossary_hint else (glossary_hint, "glossary")
+            results[i] = {"question": query, "answer": answer, "sources": [], "outcome": outcome}
+            continue
+        with trace.span("context-build"):
+            _, context, source_files = _build_context(hits, model_tag)
+        chunk_ids = [hit['id'] for hit in hits]
+        cached = answer_cache.get(model_tag, variants[i], query, chunk_ids) if use_llm else None
+        if cached:
+            cached_result(i, cached, "cache_exact")
+        elif not use_llm:
+            results[i] = {"question": query, "answer": hits[0]['document'],
+                          "sources": source_files.split(", "), "outcome": "retrieval_only"}
+        else:
+            question = _prompt_question(query, query.lower().strip(), glossary_hint, show_explanation)
+            to_generate.append((i, chunk_ids, context, source_files, question))
+
+    if to_generate:
+        usage = {}
+        with trace.span("llm-generation"):
+            answers = synthesize_answers([(item[4], item[2]) for item in to_generate], model_tag, usage=usage)
+        trace.fields.update(usage)
+        for (i, chunk_ids, context, source_files, _), answer in zip(to_generate, answers):
+            if answer not in ("Error", "No answer generated."):
+                answer_cache.put(model_tag, variants[i], queries[i], chunk_ids, embeddings[i],
+                                 answer=answer, context=context, source_files=source_files)
+            results[i] = {"question": queries[i], "answer": answer,
+                          "sources": source_files.split(", "), "outcome": "generated"}
+    trace.fields["generated"] = len(to_generate)
+    metrics.record(trace)
+    return results
+
+# ✅ One appended history line per answer
+def _log_answer(query, answer, model, started, sources=None):
+    latency_ms = (time.perf_counter() - started) * 1000
+    history.append(query, answer, model=model, latency_ms=latency_ms, sources=sources)
+
+# ✅ Suggested questions per corpus topic, precomputed and cached per style
 def suggest_questions(style="Insightful"):
-    results = collection.query(query_embeddings=[[0.0]*384], n_results=5)
-    chunks = results['documents'][0]
-    metadatas = results['metadatas'][0]
-    context = "\n".join(chunks)
-    source_files = ", ".join(set([meta['source'] for meta in metadatas]))
-
-    glossary_terms = [term for term in glossary if term in context.lower()]
-    glossary_hint = f"\n\nGlossary terms in context: {', '.join(glossary_terms)}" if glossary_terms else ""
-
-    style_map = {
-        "Insightful": "Suggest 3 insightful questions a student might ask.",
-        "Factual": "Suggest 3 factual questions based on the content.",
-        "Multiple Choice": "Create 3 multiple-choice questions with answers.",
-        "Open-ended": "Generate 3 open-ended discussion questions."
-    }
-    instruction = style_map.get(style, style_map["Insightful"])
-
-    prompt = f"""Based on the following document excerpts:{glossary_hint}
-
-{context}
-
-{instruction}
-"""
-    raw = synthesize_answer(prompt, context, MODEL_TAGS["Gemma-2B (advanced reasoning)"])
-    seen = set()
-    questions = []
-    for q in raw.split("\n"):
-        cleaned = q.strip("-•1234567890. ").strip()
-        if cleaned and cleaned not in seen:
-            questions.append(cleaned)
-            seen.add(cleaned)
-
-    return questions, f"**Sources:** {source_files}"
\ No newline at end of file
+    questions, sources = suggestion_bank.suggest(style)
+    return questions, f"**Sources:** {', '.join(sources)}"
\ No newline at end of file
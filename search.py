@@ -0,0 +1,202 @@
+# search.py
+import threading
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+from resources import get_collection, list_libraries, library_of, normalize_library, DEFAULT_LIBRARY
+from lexical_index import lexical_index
+from compact_index import compact_index
+
+# ✅ Hybrid retrieval settings
+CANDIDATES = 20   # hits taken from each retriever before fusion
+RRF_K = 60        # reciprocal-rank fusion damping constant
+SHARD_WORKERS = 8  # library shards searched in parallel
+
+_checked_libraries = set()
+_indexes_lock = threading.Lock()
+_shard_pool = ThreadPoolExecutor(max_workers=SHARD_WORKERS, thread_name_prefix="shard")
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Merges ranked id lists; each list contributes 1 / (k + rank) per id."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True), scores
+
+
+# ✅ Search filters
+def date_key(value):
+    """A date as the integer stored in chunk metadata: 2024-05-01 -> 20240501."""
+    if isinstance(value, (date, datetime)):
+        return int(value.strftime("%Y%m%d"))
+    return int(str(value).strip().replace("-", "")[:8])
+
+
+def normalize_filters(filters):
+    """
+    Validates search filters; None when nothing is filtered.
+
+    Parameters:
+        filters (dict): Any of `libraries`, `sources`, `file_types` (lists of names) and
+            `date_from`, `date_to` (dates or "YYYY-MM-DD", by file modification date).
+
+    Returns:
+        dict or None: Non-empty filters only, with library names and file types normalized
+        and dates as YYYYMMDD integers.
+    """
+    normalized = {}
+    for key, value in (filters or {}).items():
+        if value in (None, "", []):
+            continue
+        if key == "libraries":
+            normalized[key] = sorted({normalize_library(name) for name in value})
+        elif key == "sources":
+            normalized[key] = sorted(set(value))
+        elif key == "file_types":
+            normalized[key] = sorted({file_type.lower().lstrip(".") for file_type in value})
+        elif key in ("date_from", "date_to"):
+            normalized[key] = date_key(value)
+        else:
+            raise ValueError(f"Unknown search filter: {key}")
+    return normalized or None
+
+
+def chroma_where(filters):
+    # Metadata filters (everything but the library, which selects the shard) as a Chroma where clause
+    clauses = []
+    for key, field in (("sources", "source"), ("file_types", "file_type")):
+        if key in filters:
+            clauses.append({field: {"$in": filters[key]}})
+    if "date_from" in filters:
+        clauses.append({"date": {"$gte": filters["date_from"]}})
+    if "date_to" in filters:
+        clauses.append({"date": {"$lte": filters["date_to"]}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def selected_libraries(filters):
+    libraries = list_libraries()
+    if filters and "libraries" in filters:
+        return [library for library in filters["libraries"] if library in libraries]
+    return libraries
+
+
+def _ensure_indexes(libraries):
+    # Chunks embedded before the BM25 / compact index existed are indexed once, on first use
+    if _checked_libraries.issuperset(libraries):
+        return
+    with _indexes_lock:
+        for library in libraries:
+            if library in _checked_libraries:
+                continue
+            collection = get_collection(library)
+            total = collection.count()
+            if lexical_index.count(library) != total:
+                print(f"[+] Building BM25 index for library '{library}' from the existing collection...")
+                lexical_index.rebuild(collection, library)
+            if library == DEFAULT_LIBRARY and compact_index is not None and compact_index.count() != total:
+                print(f"[+] Building {compact_index.mode} compact index from the existing collection...")
+                compact_index.rebuild(collection)
+            _checked_libraries.add(library)
+
+
+def _fetch(ids):
+    # id -> (document, metadata) for the ids still stored, one get per shard
+    libraries = set(list_libraries())
+    by_library = {}
+    for doc_id in ids:
+        library = library_of(doc_id)
+        by_library.setdefault(library if library in libraries else DEFAULT_LIBRARY, []).append(doc_id)
+    stored = {}
+    for library, library_ids in by_library.items():
+        fetched = get_collection(library).get(ids=library_ids, include=["documents", "metadatas"])
+        stored.update((doc_id, (document, metadata)) for doc_id, document, metadata in
+                      zip(fetched["ids"], fetched["documents"], fetched["metadatas"]))
+    return stored
+
+
+def _dense_search_shard(library, query_embeddings, candidates, where):
+    # Per query: [(id, document, metadata, distance)] nearest first, from Chroma's HNSW or the compact index
+    if compact_index is None or library != DEFAULT_LIBRARY or where is not None:
+        dense = get_collection(library).query(query_embeddings=list(query_embeddings), n_results=candidates,
+                                              where=where)
+        return [list(zip(*columns)) for columns in
+                zip(dense["ids"], dense["documents"], dense["metadatas"], dense["distances"])]
+    nearest = [compact_index.search(embedding, k=candidates) for embedding in query_embeddings]
+    stored = _fetch({doc_id for pairs in nearest for doc_id, _ in pairs})
+    return [[(doc_id, *stored[doc_id], distance) for doc_id, distance in pairs if doc_id in stored]
+            for pairs in nearest]
+
+
+def _dense_search_many(libraries, query_embeddings, candidates, where):
+    # Fans out over the shards in parallel and merges by distance (one embedding space, one metric)
+    if len(libraries) == 1:
+        return _dense_search_shard(libraries[0], query_embeddings, candidates, where)
+    shard_results = list(_shard_pool.map(
+        lambda library: _dense_search_shard(library, query_embeddings, candidates, where), libraries
+    ))
+    return [sorted((hit for shard in per_query for hit in shard), key=lambda hit: hit[3])[:candidates]
+            for per_query in zip(*shard_results)]
+
+
+def hybrid_search(query, query_embedding, top_k=5, candidates=CANDIDATES, filters=None):
+    """
+    Dense (Chroma, or the compact index when enabled) + lexical (BM25) retrieval merged with
+    reciprocal-rank fusion.
+
+    Returns:
+        list[dict]: Up to top_k hits with `id`, `document`, `metadata`, `score` (fused),
+        `distance` (None for lexical-only hits) and `lexical` (BM25 score, 0 if absent).
+    """
+    return hybrid_search_many([query], [query_embedding], top_k, candidates, filters)[0]
+
+
+def hybrid_search_many(queries, query_embeddings, top_k=5, candidates=CANDIDATES, filters=None):
+    """
+    hybrid_search for many queries at once: one multi-query dense search per library shard
+    and one fetch for the lexical-only hits of every query.
+
+    `filters` (see normalize_filters) selects the shards to search and is pushed down into
+    both the Chroma query and the BM25 query, so only chunks in scope are ever scored.
+
+    Returns:
+        list[list[dict]]: The hits of each query, in input order.
+    """
+    filters = normalize_filters(filters)
+    libraries = selected_libraries(filters)
+    if not queries or not libraries:
+        return [[] for _ in queries]
+    _ensure_indexes(libraries)
+    lexical_filters = dict(filters, libraries=libraries) if filters and "libraries" in filters else filters
+    dense_lists = _dense_search_many(libraries, query_embeddings, candidates, chroma_where(filters or {}))
+    lexical_lists = [lexical_index.search(query, limit=candidates, filters=lexical_filters) for query in queries]
+
+    fused = []
+    missing = set()
+    for dense, lexical in zip(dense_lists, lexical_lists):
+        ranked, scores = reciprocal_rank_fusion([[item[0] for item in dense], [doc_id for doc_id, _ in lexical]])
+        ranked = ranked[:top_k]
+        dense_ids = {item[0] for item in dense}
+        missing.update(doc_id for doc_id in ranked if doc_id not in dense_ids)
+        fused.append((ranked, scores))
+    stored = _fetch(missing)
+
+    results = []
+    for dense, lexical, (ranked, scores) in zip(dense_lists, lexical_lists, fused):
+        hits = {
+            doc_id: {"id": doc_id, "document": document, "metadata": metadata, "distance": distance, "lexical": 0.0}
+            for doc_id, document, metadata, distance in dense
+        }
+        for doc_id in ranked:
+            if doc_id not in hits and doc_id in stored:
+                document, metadata = stored[doc_id]
+                hits[doc_id] = {"id": doc_id, "document": document, "metadata": metadata, "distance": None, "lexical": 0.0}
+        for doc_id, score in lexical:
+            if doc_id in hits:
+                hits[doc_id]["lexical"] = score
+        # A lexical hit may have been deleted from Chroma meanwhile
+        results.append([dict(hits[doc_id], score=scores[doc_id]) for doc_id in ranked if doc_id in hits])
+    return results
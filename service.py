@@ -0,0 +1,320 @@
+# service.py
+"""
+Headless HTTP API for DocMentor, for driving it from other services without the Gradio UI.
+
+    python service.py --port 8000
+
+Endpoints:
+    POST   /ingest            multipart `files` (+ optional `library`); queues a background ingest job (202)
+    GET    /ingest/{job_id}   job status and progress
+    DELETE /ingest/{job_id}   cancels a job
+    POST   /ask               {"question", "model", "show_explanation", "stream", "filters"}; NDJSON when streaming
+    POST   /ask/batch         {"questions": [...], "model", "show_explanation", "filters"}
+    GET    /libraries         libraries (collection shards) with their chunk counts
+    DELETE /libraries/{name}  removes a library and its chunks
+    GET    /history/export    ?format=TXT|ZIP|PDF&since=&until=&contains= ; bulk history download
+    GET    /metrics           per-stage latency percentiles, token counts and cache hit rates
+    GET    /health
+
+When every slot is busy and the wait queue is full, requests are rejected with 429 and a
+Retry-After header instead of piling up.
+"""
+import os
+import json
+import shutil
+import asyncio
+import argparse
+import functools
+import tempfile
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from resources import warm_up, get_collection, list_libraries, normalize_library, DEFAULT_LIBRARY
+from ingest_pipeline import delete_library
+from search import normalize_filters
+from retriever import answer_stream, answer_questions, MODEL_TAGS
+from ingest_jobs import ingest_jobs
+from exports import exporter, EXPORT_FORMATS
+from metrics import metrics
+
+# ✅ Service settings
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8000
+ASK_CONCURRENCY = 8          # questions answered at once (generation is further limited per model)
+ASK_MAX_WAITING = 64         # questions queued beyond that before 429
+BATCH_CONCURRENCY = 1        # batch requests run one at a time so they never starve interactive asks
+BATCH_MAX_WAITING = 4
+BATCH_MAX_QUESTIONS = 1000
+QUEUE_TIMEOUT = 60           # seconds a request may wait for a slot before 503
+RETRY_AFTER = 5              # seconds suggested to rejected clients
+DEFAULT_MODEL = "Phi3-mini (smart synthesis)"
+
+
+class Admission:
+    """Bounded concurrency plus a bounded wait queue; overflow is rejected instead of queued."""
+
+    def __init__(self, concurrency, max_waiting):
+        self.concurrency = concurrency
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.waiting = 0
+        self._slots = None
+
+    async def acquire(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)  # created on the serving loop
+        if self._slots.locked() and self.waiting >= self.max_waiting:
+            raise HTTPException(429, "Too many requests queued", headers={"Retry-After": str(RETRY_AFTER)})
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPException(503, "Timed out waiting for a free slot", headers={"Retry-After": str(RETRY_AFTER)})
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._slots.release()
+
+    def stats(self):
+        return {"active": self.active, "waiting": self.waiting,
+                "concurrency": self.concurrency, "max_waiting": self.max_waiting}
+
+
+class AdmittedStream(StreamingResponse):
+    """
+    A streaming response holding an admission slot: `finish` runs however the response ends,
+    including when the client disconnects or the connection fails before the body starts.
+    """
+
+    def __init__(self, content, finish, **kwargs):
+        super().__init__(content, **kwargs)
+        self.finish = finish
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.finish()
+
+
+async def run_admitted(admission, fn, *args, **kwargs):
+    """
+    Runs fn on a worker thread under a slot already acquired from `admission`. The slot is
+    released when the thread finishes rather than when the request ends: a client that
+    disconnects cancels the request, not the work, which keeps counting against admission.
+    """
+    try:
+        job = asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args, **kwargs))
+    except Exception:
+        admission.release()
+        raise
+
+    def finished(done):
+        admission.release()
+        if not done.cancelled():
+            done.exception()  # retrieved here in case the request is gone
+
+    job.add_done_callback(finished)
+    return await asyncio.shield(job)
+
+
+ask_admission = Admission(ASK_CONCURRENCY, ASK_MAX_WAITING)
+batch_admission = Admission(BATCH_CONCURRENCY, BATCH_MAX_WAITING)
+
+
+class SearchFilters(BaseModel):
+    libraries: Optional[List[str]] = None
+    sources: Optional[List[str]] = None
+    file_types: Optional[List[str]] = None
+    date_from: Optional[str] = None   # YYYY-MM-DD, by file modification date
+    date_to: Optional[str] = None
+
+
+class AskRequest(BaseModel):
+    question: str
+    model: str = DEFAULT_MODEL
+    show_explanation: bool = False
+    stream: bool = False
+    filters: Optional[SearchFilters] = None
+
+
+class BatchRequest(BaseModel):
+    questions: List[str]
+    model: str = DEFAULT_MODEL
+    show_explanation: bool = False
+    filters: Optional[SearchFilters] = None
+
+
+def _check_model(model):
+    if model not in MODEL_TAGS:
+        raise HTTPException(422, f"Unknown model {model!r}; expected one of {sorted(MODEL_TAGS)}")
+
+
+def _filters(filters):
+    try:
+        return normalize_filters(filters.model_dump() if filters else None)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+
+
+def _last(events):
+    event = None
+    for event in events:
+        pass
+    return event
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Same startup as the UI: models load in the background, interrupted ingest jobs resume
+    warm_up(background=True)
+    ingest_jobs.start()
+    yield
+
+
+api = FastAPI(title="DocMentor", lifespan=lifespan)
+
+
+# ✅ Ingestion
+@api.post("/ingest", status_code=202)
+async def ingest(files: List[UploadFile] = File(...), library: str = Form(DEFAULT_LIBRARY)):
+    try:
+        library = normalize_library(library)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    upload_dir = tempfile.mkdtemp(prefix="docmentor-upload-")
+    try:
+        paths = []
+        for i, upload in enumerate(files):
+            # One folder per file: uploads sharing a name never overwrite each other
+            os.makedirs(os.path.join(upload_dir, str(i)))
+            path = os.path.join(upload_dir, str(i), os.path.basename(upload.filename or "upload"))
+            with open(path, "wb") as f:
+                await run_in_threadpool(shutil.copyfileobj, upload.file, f)
+            paths.append(path)
+        # submit() copies the files into the job's own upload folder
+        job_id = await run_in_threadpool(ingest_jobs.submit, paths, library)
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+    return ingest_jobs.status(job_id)
+
+
+@api.get("/ingest/{job_id}")
+async def ingest_status(job_id: str):
+    job = ingest_jobs.status(job_id)
+    if job is None:
+        raise HTTPException(404, "Unknown ingest job")
+    return job
+
+
+@api.delete("/ingest/{job_id}")
+async def ingest_cancel(job_id: str):
+    job = ingest_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(404, "Unknown ingest job")
+    return job
+
+
+# ✅ Questions
+@api.post("/ask")
+async def ask(request: AskRequest):
+    _check_model(request.model)
+    filters = _filters(request.filters)
+    await ask_admission.acquire()
+    events = answer_stream(request.question, request.model, request.show_explanation, filters)
+    if not request.stream:
+        return await run_admitted(ask_admission, _last, events)
+
+    def finish():
+        ask_admission.release()
+        try:
+            events.close()  # records the trace even if the client went away
+        except ValueError:
+            pass
+
+    async def ndjson():
+        # One line per new fragment, then the complete answer with sources and context
+        sent = 0
+        async for event in iterate_in_threadpool(events):
+            if event["done"]:
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+            elif len(event["answer"]) > sent:
+                yield json.dumps({"delta": event["answer"][sent:], "done": False}, ensure_ascii=False) + "\n"
+                sent = len(event["answer"])
+
+    try:
+        return AdmittedStream(ndjson(), finish, media_type="application/x-ndjson")
+    except Exception:
+        finish()
+        raise
+
+
+@api.post("/ask/batch")
+async def ask_batch(request: BatchRequest):
+    _check_model(request.model)
+    filters = _filters(request.filters)
+    if len(request.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(413, f"At most {BATCH_MAX_QUESTIONS} questions per batch")
+    await batch_admission.acquire()
+    answers = await run_admitted(batch_admission, answer_questions, request.questions, request.model,
+                                 request.show_explanation, filters=filters)
+    return {"answers": answers}
+
+
+# ✅ Libraries
+@api.get("/libraries")
+async def libraries():
+    def counts():
+        return {library: get_collection(library).count() for library in list_libraries()}
+    return {"libraries": await run_in_threadpool(counts)}
+
+
+@api.delete("/libraries/{name}")
+async def remove_library(name: str):
+    try:
+        library = normalize_library(name)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    if library not in list_libraries():
+        raise HTTPException(404, "Unknown library")
+    return {"library": library, "chunks_removed": await run_in_threadpool(delete_library, library)}
+
+
+# ✅ History export (rendered on the export pool, streamed from disk)
+@api.get("/history/export")
+async def export_history(format: str = "ZIP", since: Optional[str] = None, until: Optional[str] = None,
+                         contains: Optional[str] = None):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(422, f"Unknown format {format!r}; expected one of {list(EXPORT_FORMATS)}")
+    path, count = await asyncio.wrap_future(exporter.submit(exporter.history, format, since, until, contains))
+    return FileResponse(path, filename=os.path.basename(path), headers={"X-Entry-Count": str(count)})
+
+
+# ✅ Operations
+@api.get("/metrics")
+async def get_metrics():
+    return dict(metrics.snapshot(), queues={"ask": ask_admission.stats(), "batch": batch_admission.stats()})
+
+
+@api.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+def main():
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Run the headless DocMentor HTTP API.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    args = parser.parse_args()
+    uvicorn.run(api, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+# suggestions.py
+import os
+import json
+import random
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
+from resources import get_collection, get_glossary, list_libraries, DEFAULT_LIBRARY
+from llm_ollama import synthesize_answer
+
+# ✅ Suggestion settings
+SUGGESTIONS_FILE = "./embeddings/suggestions.json"
+SUGGESTION_CLUSTERS = 8        # topics the corpus is split into
+CHUNKS_PER_CLUSTER = 3         # representative chunks sent to the model per topic
+MAX_SAMPLE = 20000             # embeddings clustered at most (sampled by page on large corpora)
+KMEANS_ITERATIONS = 20
+REFRESH_DELAY = 5.0            # seconds of ingest quiet before re-clustering
+SUGGESTION_MODEL = "gemma:2b"
+DEFAULT_STYLE = "Insightful"   # precomputed after every refresh; other styles right after, in the background
+
+STYLE_MAP = {
+    "Insightful": "Suggest 3 insightful questions a student might ask.",
+    "Factual": "Suggest 3 factual questions based on the content.",
+    "Multiple Choice": "Create 3 multiple-choice questions with answers.",
+    "Open-ended": "Generate 3 open-ended discussion questions."
+}
+
+
+def kmeans(vectors, k, init=None, iterations=KMEANS_ITERATIONS, seed=0):
+    """
+    Plain k-means; `init` warm-starts from earlier centroids so topics stay stable between refreshes.
+
+    Returns:
+        (centroids, labels)
+    """
+    rng = np.random.default_rng(seed)
+    if init is not None and len(init) == k and init.shape[1] == vectors.shape[1]:
+        centroids = init.astype(np.float32)
+    else:
+        # k-means++ seeding
+        centroids = [vectors[rng.integers(len(vectors))]]
+        for _ in range(1, k):
+            nearest = np.min([((vectors - c) ** 2).sum(axis=1) for c in centroids], axis=0)
+            total = nearest.sum()
+            pick = rng.choice(len(vectors), p=nearest / total) if total else rng.integers(len(vectors))
+            centroids.append(vectors[pick])
+        centroids = np.array(centroids, dtype=np.float32)
+    squared = (vectors ** 2).sum(axis=1)[:, None]
+    for _ in range(iterations):
+        distances = squared - 2 * vectors @ centroids.T + (centroids ** 2).sum(axis=1)[None, :]
+        labels = distances.argmin(axis=1)
+        updated = np.array([vectors[labels == i].mean(axis=0) if np.any(labels == i) else centroids[i]
+                            for i in range(k)], dtype=np.float32)
+        if np.allclose(updated, centroids):
+            break
+        centroids = updated
+    return centroids, labels
+
+
+def parse_questions(raw):
+    seen = set()
+    questions = []
+    for q in raw.split("\n"):
+        cleaned = q.strip("-•1234567890. ").strip()
+        if cleaned and cleaned not in seen:
+            questions.append(cleaned)
+            seen.add(cleaned)
+    return questions
+
+
+class SuggestionBank:
+    """
+    Suggested questions precomputed per topic of the corpus.
+
+    The stored embeddings are clustered with k-means and each cluster is represented by
+    the chunks nearest its centroid. Questions are cached per (cluster, style), keyed on
+    the representative chunk ids, so a refresh after ingestion only regenerates topics
+    whose representatives actually changed. Every style is generated in the background
+    ahead of its first click. Clusters and questions persist across restarts.
+    """
+
+    def __init__(self, path=SUGGESTIONS_FILE, clusters=SUGGESTION_CLUSTERS):
+        self.path = path
+        self.k = clusters
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._timer = None
+        self._clicks = 0
+        self._centroids = None
+        self._clusters = []    # [{"key", "chunk_ids", "libraries", "sources", "size"}]
+        self._questions = {}   # "cluster key|style" -> [questions]
+        self._filling = {}     # style -> Future of the fill in progress
+        self._prefetching = False
+        self._prefetch_pending = False
+        self._load()
+
+    # ✅ Persistence
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        self._centroids = np.array(state["centroids"], dtype=np.float32) if state.get("centroids") else None
+        self._clusters = state.get("clusters", [])
+        self._questions = state.get("questions", {})
+
+    def _save(self):
+        with self._lock:
+            state = {"centroids": None if self._centroids is None else self._centroids.tolist(),
+                     "clusters": self._clusters, "questions": self._questions}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".suggestions-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    # ✅ Clustering
+    def _sample(self, page_size=1000):
+        # Every library shard, sampled in proportion to its size on large corpora
+        collections = [(library, get_collection(library)) for library in list_libraries()]
+        counts = [collection.count() for _, collection in collections]
+        total = sum(counts)
+        ids, vectors, sources, libraries = [], [], [], []
+        for (library, collection), count in zip(collections, counts):
+            offsets = list(range(0, count, page_size))
+            if total > MAX_SAMPLE:
+                pages = max(1, round(MAX_SAMPLE * count / total / page_size))
+                offsets = sorted(random.Random(0).sample(offsets, min(pages, len(offsets))))
+            for offset in offsets:
+                page = collection.get(include=["embeddings", "metadatas"], limit=page_size, offset=offset)
+                ids.extend(page["ids"])
+                vectors.extend(page["embeddings"])
+                sources.extend((meta or {}).get("source") for meta in page["metadatas"])
+                libraries.extend([library] * len(page["ids"]))
+        return ids, np.asarray(vectors, dtype=np.float32), sources, libraries
+
+    def recluster(self):
+        """Re-clusters the chunks of every library; returns the number of topics."""
+        ids, vectors, sources, libraries = self._sample()
+        if not ids:
+            with self._lock:
+                self._centroids, self._clusters = None, []
+            self._save()
+            return 0
+        k = min(self.k, len(ids))
+        centroids, labels = kmeans(vectors, k, init=self._centroids)
+        clusters = []
+        for i in range(k):
+            members = np.flatnonzero(labels == i)
+            if not len(members):
+                continue
+            order = members[np.argsort(((vectors[members] - centroids[i]) ** 2).sum(axis=1))]
+            # Nearest chunks first, one per source file before taking seconds from the same file
+            picked, seen_sources = [], set()
+            for row in order:
+                if sources[row] not in seen_sources:
+                    picked.append(row)
+                    seen_sources.add(sources[row])
+                if len(picked) == CHUNKS_PER_CLUSTER:
+                    break
+            for row in order:
+                if len(picked) == CHUNKS_PER_CLUSTER:
+                    break
+                if row not in picked:
+                    picked.append(row)
+            picked.sort(key=lambda row: ids[row])
+            chunk_ids = [ids[row] for row in picked]
+            clusters.append({
+                "key": hashlib.sha1("\n".join(chunk_ids).encode("utf-8")).hexdigest()[:16],
+                "chunk_ids": chunk_ids,
+                "libraries": [libraries[row] for row in picked],
+                "sources": sorted({sources[row] for row in picked}),
+                "size": int(len(members)),
+            })
+        clusters.sort(key=lambda cluster: cluster["size"], reverse=True)
+        with self._lock:
+            self._centroids, self._clusters = centroids, clusters
+            live = {cluster["key"] for cluster in clusters}
+            self._questions = {key: value for key, value in self._questions.items() if key.split("|")[0] in live}
+        self._save()
+        return len(clusters)
+
+    # ✅ Question generation
+    def _generate(self, cluster, style):
+        # Topics saved before libraries existed only hold default-library chunks
+        by_library = {}
+        for chunk_id, library in zip(cluster["chunk_ids"], cluster.get("libraries") or
+                                     [DEFAULT_LIBRARY] * len(cluster["chunk_ids"])):
+            by_library.setdefault(library, []).append(chunk_id)
+        documents = []
+        for library, chunk_ids in by_library.items():
+            documents.extend(get_collection(library).get(ids=chunk_ids, include=["documents"])["documents"])
+        context = "\n".join(documents)
+        glossary_terms = get_glossary().index.find_in(context)
+        glossary_hint = f"\n\nGlossary terms in context: {', '.join(glossary_terms)}" if glossary_terms else ""
+        instruction = STYLE_MAP.get(style, STYLE_MAP[DEFAULT_STYLE])
+        prompt = f"Based on the document excerpts in the context:{glossary_hint}\n\n{instruction}"
+        raw = synthesize_answer(prompt, context, SUGGESTION_MODEL)
+        if raw in ("Error", "No answer generated."):
+            return None  # not cached, retried on the next click
+        return parse_questions(raw)
+
+    def _missing(self, style):
+        with self._lock:
+            return [cluster for cluster in self._clusters if f"{cluster['key']}|{style}" not in self._questions]
+
+    def _fill(self, style):
+        # Generates questions for every topic that has none cached for this style.
+        # A fill already running for the style is waited on rather than repeated.
+        with self._lock:
+            running = self._filling.get(style)
+            owner = running is None
+            if owner:
+                running = self._filling[style] = Future()
+        if not owner:
+            running.result()
+            return
+        try:
+            missing = self._missing(style)
+            if missing:
+                with ThreadPoolExecutor(max_workers=len(missing)) as pool:
+                    generated = list(pool.map(lambda cluster: self._generate(cluster, style), missing))
+                with self._lock:
+                    for cluster, questions in zip(missing, generated):
+                        if questions:
+                            self._questions[f"{cluster['key']}|{style}"] = questions
+                self._save()
+            running.set_result(None)
+        except Exception as e:
+            running.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._filling.pop(style, None)
+
+    def prefetch(self):
+        """Generates the questions of every style in the background, the default style first."""
+        styles = [DEFAULT_STYLE] + [style for style in STYLE_MAP if style != DEFAULT_STYLE]
+        if not any(self._missing(style) for style in styles):
+            return
+        with self._lock:
+            self._prefetch_pending = True  # picked up by a running prefetch once it finishes its pass
+            if self._prefetching:
+                return
+            self._prefetching = True
+
+        def run():
+            while True:
+                with self._lock:
+                    if not self._prefetch_pending:
+                        self._prefetching = False
+                        return
+                    self._prefetch_pending = False
+                for style in styles:
+                    try:
+                        self._fill(style)
+                    except Exception as e:
+                        print(f"[!] Suggested questions for {style} failed: {e}")
+
+        threading.Thread(target=run, name="suggestion-prefetch", daemon=True).start()
+
+    def suggest(self, style=DEFAULT_STYLE, limit=SUGGESTION_CLUSTERS):
+        """
+        Returns (questions, sources): one question per topic, rotating through each
+        topic's questions on repeated calls. Instant once the style has been generated.
+        """
+        if not self._clusters:
+            with self._refresh_lock:
+                if not self._clusters:
+                    self.recluster()
+        self._fill(style)
+        self.prefetch()
+        with self._lock:
+            turn = self._clicks
+            self._clicks += 1
+            questions, sources = [], set()
+            for cluster in self._clusters[:limit]:
+                cached = self._questions.get(f"{cluster['key']}|{style}")
+                if cached and cached[turn % len(cached)] not in questions:
+                    questions.append(cached[turn % len(cached)])
+                    sources.update(cluster["sources"])
+        return questions, sorted(sources)
+
+    # ✅ Incremental refresh after ingestion
+    def refresh(self):
+        with self._refresh_lock:
+            try:
+                topics = self.recluster()
+                self._fill(DEFAULT_STYLE)
+                print(f"[✓] Suggested questions refreshed for {topics} topic(s)")
+                self.prefetch()
+            except Exception as e:
+                print(f"[!] Suggestion refresh failed: {e}")
+
+    def on_ingest(self, event, ids, *rest):
+        # Debounced: a large ingest triggers one refresh once writes go quiet
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(REFRESH_DELAY, self.refresh)
+            self._timer.daemon = True
+            self._timer.start()
+
+
+suggestion_bank = SuggestionBank()
@@ -0,0 +1,58 @@
+import random
+from bisect import bisect_right
+import pytest
+from utils.chunker import iter_chunk_spans, chunk_text
+
+WORDS = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]
+
+
+def _pages(count, seed=0):
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(count):
+        sentences = (" ".join(rng.choices(WORDS, k=rng.randint(3, 30))) + rng.choice([".", "!", "?", ""])
+                     for _ in range(rng.randint(1, 8)))
+        pages.append(" ".join(sentences) + "\n")
+    return pages
+
+
+def _check_spans(segments, spans):
+    document = "".join(segments)
+    starts = [0]
+    for segment in segments[:-1]:
+        starts.append(starts[-1] + len(segment))
+    assert spans
+    for span in spans:
+        # Offsets point at the chunk's text, up to the whitespace the chunker normalizes
+        assert " ".join(document[span["char_start"]:span["char_end"]].split()) == span["text"]
+        assert span["segment_start"] == bisect_right(starts, span["char_start"]) - 1
+        assert span["segment_end"] == bisect_right(starts, span["char_end"] - 1) - 1
+
+
+@pytest.mark.parametrize("max_length, overlap, unit", [(2000, 200, "chars"), (300, 50, "chars"), (100, 20, "tokens")])
+def test_span_offsets_match_the_source(max_length, overlap, unit):
+    segments = _pages(60)
+    _check_spans(segments, list(iter_chunk_spans(segments, max_length, overlap, unit)))
+
+
+def test_spans_cover_the_whole_document():
+    segments = _pages(40, seed=1)
+    document = "".join(segments)
+    spans = list(iter_chunk_spans(segments, 500, 50))
+    assert spans[0]["char_start"] == 0
+    assert spans[-1]["char_end"] == len(document.rstrip())
+    for previous, span in zip(spans, spans[1:]):
+        # Consecutive chunks overlap or are separated by whitespace only
+        assert not document[previous["char_end"]:span["char_start"]].strip()
+
+
+def test_text_without_punctuation_is_split_with_offsets():
+    segments = ["word " * 5000, "tail. " * 10]
+    spans = list(iter_chunk_spans(segments, 400, 40, max_carry=1000))
+    assert all(len(span["text"]) <= 400 for span in spans)
+    _check_spans(segments, spans)
+
+
+def test_a_string_and_its_segments_give_the_same_chunks():
+    segments = _pages(20, seed=2)
+    assert [span["text"] for span in iter_chunk_spans(segments, 300, 50)] == chunk_text("".join(segments), 300, 50)
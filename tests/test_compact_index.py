@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from compact_index import CompactIndex
+
+DIM = 16
+
+
+def _vectors(count, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _ids(result):
+    return [doc_id for doc_id, _ in result]
+
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_reload_after_delete_keeps_deleted_rows_out(tmp_path, mode):
+    vectors = _vectors(100)
+    ids = [f"c{i}" for i in range(100)]
+    index = CompactIndex(str(tmp_path), mode=mode)
+    index.upsert(ids, vectors)
+    index.delete(ids[:10])  # below the compaction ratio, so only tombstoned
+
+    reloaded = CompactIndex(str(tmp_path), mode=mode)
+    assert reloaded.count() == 90
+    hits = _ids(reloaded.search(vectors[0], k=5))
+    assert "c0" not in hits
+    assert set(_ids(reloaded.search(vectors[50], k=100))) == set(ids[10:])
+    assert _ids(reloaded.search(vectors[50], k=1)) == ["c50"]
+
+
+def test_reload_after_reupsert_and_compaction(tmp_path):
+    vectors = _vectors(40)
+    ids = [f"c{i}" for i in range(40)]
+    index = CompactIndex(str(tmp_path))
+    index.upsert(ids, vectors)
+    index.upsert(["c1"], vectors[2:3])  # the old row for c1 is tombstoned
+    index.delete(ids[20:])              # past the compaction ratio: files are rewritten
+
+    reloaded = CompactIndex(str(tmp_path))
+    assert reloaded.count() == 20
+    result = reloaded.search(vectors[2], k=2)
+    assert set(_ids(result)) == {"c1", "c2"}
+    assert all(distance == pytest.approx(0.0, abs=1e-5) for _, distance in result)
+    assert not set(_ids(reloaded.search(vectors[30], k=40))) & set(ids[20:])
+
+
+def test_reload_ignores_rows_past_the_committed_count(tmp_path):
+    vectors = _vectors(10)
+    index = CompactIndex(str(tmp_path))
+    index.upsert([f"c{i}" for i in range(10)], vectors)
+    with open(tmp_path / "vectors.f32", "ab") as f:
+        f.write(b"\0" * DIM * 4)  # a write interrupted before meta.json was updated
+
+    reloaded = CompactIndex(str(tmp_path))
+    assert reloaded.count() == 10
+    assert _ids(reloaded.search(vectors[3], k=1)) == ["c3"]
@@ -0,0 +1,35 @@
+import random
+from glossary_index import GlossaryIndex, normalize, PENDING_LIMIT
+
+
+def _brute_force(terms, text):
+    haystack = normalize(text)
+    return {term for term in terms if normalize(term) in haystack}
+
+
+def test_find_in_matches_overlapping_terms():
+    terms = ["he", "she", "hers", "his", "Digital Marketing", "marketing"]
+    index = GlossaryIndex(terms)
+    text = "Ushers said THIS about digital   marketing."
+    assert set(index.find_in(text)) == _brute_force(terms, text)
+    assert index.find_in("nothing relevant") == []
+
+
+def test_find_in_agrees_with_brute_force():
+    rng = random.Random(0)
+    terms = {"".join(rng.choices("abc ", k=rng.randint(1, 6))).strip() or "a" for _ in range(200)}
+    index = GlossaryIndex(terms)
+    for _ in range(50):
+        text = "".join(rng.choices("abc ", k=rng.randint(0, 80)))
+        assert set(index.find_in(text)) == _brute_force(terms, text)
+
+
+def test_terms_added_after_a_build_are_found():
+    index = GlossaryIndex(["return on investment"])
+    assert index.find_in("the return on investment rose") == ["return on investment"]
+    index.add("Churn Rate")  # matched directly until the automaton is rebuilt
+    assert set(index.find_in("churn rate and return on investment")) == {"Churn Rate", "return on investment"}
+    extra = [f"term{i:04d}" for i in range(PENDING_LIMIT + 1)]
+    for term in extra:
+        index.add(term)
+    assert set(index.find_in("term0000 term0256 churn rate")) == {"term0000", "term0256", "Churn Rate"}
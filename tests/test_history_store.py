@@ -0,0 +1,35 @@
+import json
+from history_store import HistoryStore
+
+
+def _write(path, entries, tail=""):
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+        f.write(tail)
+
+
+def _entry(i):
+    return {"timestamp": None, "question": f"q{i}", "answer": f"a{i}", "model": None, "latency_ms": None,
+            "sources": []}
+
+
+def test_truncated_trailing_line_is_skipped(tmp_path):
+    path = tmp_path / "history.jsonl"
+    _write(path, [_entry(i) for i in range(3)], tail='{"timestamp": "2024-05-01T10:00:00", "quest')
+
+    store = HistoryStore(str(path), legacy_path=None)
+    assert [entry["question"] for entry in store.tail()] == ["q0", "q1", "q2"]
+
+    store.append("q3", "a3")
+    assert [entry["question"] for entry in store.iter_entries()] == ["q0", "q1", "q2", "q3"]
+    reopened = HistoryStore(str(path), legacy_path=None)
+    assert [entry["question"] for entry in reopened.tail(2)] == ["q2", "q3"]
+
+
+def test_tail_of_zero_is_empty(tmp_path):
+    path = tmp_path / "history.jsonl"
+    _write(path, [_entry(i) for i in range(3)])
+    store = HistoryStore(str(path), legacy_path=None)
+    assert store.tail(0) == []
+    assert [entry["question"] for entry in store.tail(1)] == ["q2"]
@@ -1,29 +1,154 @@
 import re
+from bisect import bisect_right
+from collections import deque
 
-print("[✓] chunker.py loaded successfully")
+# Sentence boundary: terminal punctuation followed by whitespace
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+WORD = re.compile(r'\S+')
+# Text without any sentence boundary is force-split past this many characters,
+# so a stream with no punctuation (logs, tables, OCR dumps) never piles up in memory
+MAX_CARRY = 1 << 16
 
-def chunk_text(text, max_length=2000, overlap=200):
+
+def _measure(text, unit):
+    return len(text.split()) if unit == "tokens" else len(text)
+
+
+def _split_sentences(segments, starts, max_carry=MAX_CARRY):
+    # Yields (raw sentence, offset of its first character in the concatenated segments).
+    # Sentences may span segments (e.g. PDF pages), so the unfinished tail is carried over;
+    # the document offset of each segment is appended to `starts` as it is read.
+    carry, carry_at = "", 0
+    for segment in segments:
+        starts.append(carry_at + len(carry))
+        text = carry + segment
+        start = 0
+        for match in SENTENCE_END.finditer(text):
+            yield text[start:match.start()], carry_at + start
+            start = match.end()
+        carry, carry_at = text[start:], carry_at + start
+        while len(carry) > max_carry:
+            # Cut at the last whitespace that fits, or mid-word if there is none
+            cut = max(carry.rfind(" ", 0, max_carry), carry.rfind("\n", 0, max_carry)) + 1 or max_carry
+            yield carry[:cut], carry_at
+            carry, carry_at = carry[cut:], carry_at + cut
+    yield carry, carry_at
+
+
+def _split_long(raw, offset, max_length, unit):
+    # Yields (piece, start, end): the normalized sentence, cut at word boundaries when it
+    # is longer than a chunk, with the document offsets of the raw text it covers
+    sentence = " ".join(raw.split())  # Normalize whitespace
+    if not sentence:
+        return
+    if _measure(sentence, unit) <= max_length:
+        yield sentence, offset + len(raw) - len(raw.lstrip()), offset + len(raw.rstrip())
+        return
+    words = [(m.group(), offset + m.start(), offset + m.end()) for m in WORD.finditer(raw)]
+    if unit == "tokens":
+        for i in range(0, len(words), max_length):
+            group = words[i:i + max_length]
+            yield " ".join(word for word, _, _ in group), group[0][1], group[-1][2]
+        return
+    piece, piece_start, piece_end = [], 0, 0
+    size = 0
+    for word, start, end in words:
+        # Words longer than a chunk are broken into chunk-sized slices
+        while len(word) > max_length:
+            if piece:
+                yield " ".join(piece), piece_start, piece_end
+                piece, size = [], 0
+            yield word[:max_length], start, start + max_length
+            word, start = word[max_length:], start + max_length
+        if piece and size + 1 + len(word) > max_length:
+            yield " ".join(piece), piece_start, piece_end
+            piece, size = [], 0
+        if not piece:
+            piece_start = start
+        size += len(word) + (1 if piece else 0)
+        piece.append(word)
+        piece_end = end
+    if piece:
+        yield " ".join(piece), piece_start, piece_end
+
+
+def iter_chunk_spans(text, max_length=2000, overlap=200, unit="chars", max_carry=MAX_CARRY):
+    """
+    Like iter_chunks, but also locates each chunk in the source, for citations.
+
+    Segments are read one at a time and only the unfinished sentence is carried over
+    (at most `max_carry` characters), so memory does not grow with the document size.
+
+    Yields:
+        dict: `text`, `char_start` / `char_end` (offsets into the segments concatenated as
+        they were read) and `segment_start` / `segment_end` (0-based index of the segments
+        holding the first and last character, i.e. the pages of a PDF).
     """
-    Splits text into overlapping chunks based on line accumulation.
-    Each chunk will be under max_length characters, with overlap preserved.
+    if unit not in ("chars", "tokens"):
+        raise ValueError(f"Unsupported chunk unit: {unit}")
+    if not 0 <= overlap < max_length:
+        raise ValueError("overlap must be non-negative and smaller than max_length")
+
+    segments = [text] if isinstance(text, str) else text
+    starts = []  # document offset of each segment read so far
+    sep = 0 if unit == "tokens" else 1  # cost of the joining space
+    window = deque()  # (piece, length, start, end)
+    size = 0
+    fresh = False  # window holds text not yet emitted
+
+    def emit():
+        char_start, char_end = window[0][2], window[-1][3]
+        return {
+            "text": " ".join(piece for piece, _, _, _ in window),
+            "char_start": char_start,
+            "char_end": char_end,
+            "segment_start": bisect_right(starts, char_start) - 1,
+            "segment_end": bisect_right(starts, char_end - 1) - 1,
+        }
+
+    for raw, offset in _split_sentences(segments, starts, max_carry):
+        for piece, start, end in _split_long(raw, offset, max_length, unit):
+            n = _measure(piece, unit)
+            if window and size + sep + n > max_length:
+                if fresh:
+                    yield emit()
+                    fresh = False
+                # Keep only the tail that fits the overlap, and still leaves room for this piece
+                while window and (size > overlap or size + sep + n > max_length):
+                    dropped = window.popleft()[1]
+                    size -= dropped + (sep if window else 0)
+            size += n + (sep if window else 0)
+            window.append((piece, n, start, end))
+            fresh = True
+
+    if fresh:
+        yield emit()
+
+
+def iter_chunks(text, max_length=2000, overlap=200, unit="chars"):
     """
-    # Normalize whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
+    Yields overlapping chunks in a single pass over the text's sentences.
+
+    Parameters:
+        text (str | Iterable[str]): The document text, or a stream of text segments
+            (concatenated as-is, so each should end where the next one begins).
+        max_length (int): Maximum chunk size, in `unit`s.
+        overlap (int): How much trailing text of one chunk is repeated at the start of the next, in `unit`s.
+        unit (str): "chars" (default) or "tokens" (whitespace-separated words).
 
-    lines = text.split('. ')  # Split by sentence for better semantic grouping
-    chunks = []
-    i = 0
+    Yields:
+        str: One chunk at a time.
+    """
+    for span in iter_chunk_spans(text, max_length, overlap, unit):
+        yield span["text"]
 
-    while i < len(lines):
-        current = ""
-        start = i
-        while i < len(lines) and len(current) + len(lines[i]) < max_length:
-            current += lines[i].strip() + ". "
-            i += 1
-        chunks.append(current.strip())
-        i = max(start + 1, i - overlap)  # Backtrack for overlap
 
-    return chunks
+def chunk_text(text, max_length=2000, overlap=200, unit="chars"):
+    """
+    Splits text into overlapping chunks, each at most max_length long.
+    Overlap is measured in the same unit as max_length, not in sentences.
+    """
+    return list(iter_chunks(text, max_length, overlap, unit))
 
 # Debug mode (optional)
 if __name__ == "__main__":
@@ -31,4 +156,4 @@ if __name__ == "__main__":
         text = f.read()
     chunks = chunk_text(text)
     print(f"[✓] Generated {len(chunks)} chunks.")
-    print("🔍 Sample chunk:\n", chunks[0])
\ No newline at end of file
+    print("🔍 Sample chunk:\n", chunks[0])
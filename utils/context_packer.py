@@ -0,0 +1,51 @@
+from utils.chunker import SENTENCE_END
+
+# Rough tokens-per-character ratio for English text with the models we run
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def pack_context(hits, budget_tokens, min_novelty=0.2):
+    """
+    Builds the prompt context from retrieved chunks within a token budget.
+
+    Chunks are taken best first: by cross-encoder `rerank` score when the hits were
+    reranked, by fused `score` otherwise. Sentences already included from a previous
+    chunk (the overlap between neighbouring chunks) are dropped, chunks that add
+    less than `min_novelty` new text are skipped, and the last chunk that fits is
+    cut at a sentence boundary.
+
+    Parameters:
+        hits (list[dict]): Retrieved chunks with `id`, `document`, `score` and optionally `rerank`.
+        budget_tokens (int): Maximum estimated tokens of context.
+        min_novelty (float): Minimum share of a chunk's text that must be new.
+
+    Returns:
+        list[dict]: Packed pieces with `id`, `text` and `metadata`, in packing order.
+    """
+    seen = set()
+    packed = []
+    remaining = budget_tokens
+    for hit in sorted(hits, key=lambda h: h.get("rerank", h["score"]), reverse=True):
+        sentences = [s.strip() for s in SENTENCE_END.split(hit["document"]) if s.strip()]
+        novel = [s for s in sentences if " ".join(s.lower().split()) not in seen]
+        novel_chars = sum(len(s) for s in novel)
+        if not novel or novel_chars < min_novelty * len(hit["document"]):
+            continue
+
+        kept = []
+        for sentence in novel:
+            cost = estimate_tokens(sentence) + 1
+            if cost > remaining:
+                break
+            kept.append(sentence)
+            remaining -= cost
+        if kept:
+            seen.update(" ".join(s.lower().split()) for s in kept)
+            packed.append({"id": hit["id"], "text": " ".join(kept), "metadata": hit.get("metadata")})
+        if len(kept) < len(novel):
+            break  # budget exhausted
+    return packed
@@ -1,22 +1,59 @@
 import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import groupby
 from PyPDF2 import PdfReader
 import docx
 
+# Pages extracted per worker task when a large PDF is split across processes
+PAGES_PER_TASK = 16
+# Characters read at a time from a TXT file
+TXT_BLOCK_SIZE = 1 << 20
+# Workers start from a fresh interpreter: forking a process that already runs UI and
+# model thread pools can leave a child holding a lock no thread will ever release
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
 def load_txt(file_path):
     with open(file_path, "r", encoding="utf-8") as f:
         return f.read()
 
+def iter_txt_blocks(file_path, block_size=TXT_BLOCK_SIZE):
+    # Fixed-size blocks: the chunker carries words and sentences across block boundaries
+    with open(file_path, "r", encoding="utf-8") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return
+            yield block
+
+def _page_text(page):
+    # Each page ends with a newline so words never run together across pages
+    return (page.extract_text() or "") + "\n"
+
+def _pdf_page_range(file_path, start, stop):
+    # Runs in a worker process: each task opens its own reader
+    reader = PdfReader(file_path)
+    return [_page_text(reader.pages[i]) for i in range(start, stop)]
+
+def iter_pdf_pages(file_path):
+    reader = PdfReader(file_path)
+    for page in reader.pages:
+        yield _page_text(page)
+
 def load_pdf(file_path):
     try:
-        reader = PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() or ""
-        return text
+        return "".join(iter_pdf_pages(file_path))
     except Exception as e:
         return f"❌ Error loading PDF: {str(e)}"
 
 
+def iter_docx_paragraphs(file_path):
+    doc = docx.Document(file_path)
+    for para in doc.paragraphs:
+        if para.text.strip():
+            yield para.text + "\n"
+
 def load_docx(file_path):
     try:
         doc = docx.Document(file_path)
@@ -35,4 +72,101 @@ def load_document(file_path):
     elif ext == ".txt":
         return load_txt(file_path)
     else:
-        raise ValueError(f"Unsupported file type: {ext}")
\ No newline at end of file
+        raise ValueError(f"Unsupported file type: {ext}")
+
+# ✅ Streaming + parallel loading
+def iter_document(file_path):
+    """
+    Yields a document's text as segments instead of one string: one per PDF page, one per
+    DOCX paragraph and fixed-size blocks of a TXT file, so memory stays bounded however
+    large the file is. Joined together, the segments are the document's text.
+    Unlike load_document, extraction errors are raised rather than returned as text.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".pdf":
+        yield from iter_pdf_pages(file_path)
+    elif ext == ".docx":
+        yield from iter_docx_paragraphs(file_path)
+    elif ext == ".txt":
+        yield from iter_txt_blocks(file_path)
+    else:
+        raise ValueError(f"Unsupported file type: {ext}")
+
+def _load_whole(file_path):
+    return list(iter_document(file_path))
+
+def _plan_tasks(file_path, pages_per_task):
+    # One task per file, or one per page range for PDFs
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".txt":
+        # Nothing to extract: streamed block by block in the reading process, never held whole
+        return [(iter_txt_blocks, (file_path,))]
+    if ext != ".pdf":
+        return [(_load_whole, (file_path,))]
+    page_count = len(PdfReader(file_path).pages)
+    if page_count <= pages_per_task:
+        return [(_load_whole, (file_path,))]
+    return [(_pdf_page_range, (file_path, start, min(start + pages_per_task, page_count)))
+            for start in range(0, page_count, pages_per_task)]
+
+def _failed(exc):
+    future = Future()
+    future.set_exception(exc)
+    return future
+
+def _streamed(file_path):
+    # A finished future whose result is a lazy block reader
+    future = Future()
+    future.set_result(iter_txt_blocks(file_path))
+    return future
+
+def _iter_results(paths, executor, pages_per_task, lookahead):
+    # Submits tasks in file order with bounded lookahead and yields results in the same order
+    def tasks():
+        for index, path in enumerate(paths):
+            try:
+                planned = _plan_tasks(path, pages_per_task)
+            except Exception as e:
+                yield index, path, None, e
+                continue
+            for fn, args in planned:
+                yield index, path, fn, args
+
+    in_flight = deque()
+    for index, path, fn, args in tasks():
+        if fn is None:
+            future = _failed(args)
+        elif fn is iter_txt_blocks:
+            future = _streamed(*args)
+        else:
+            future = executor.submit(fn, *args)
+        in_flight.append((index, path, future))
+        while len(in_flight) > lookahead:
+            yield in_flight.popleft()
+    while in_flight:
+        yield in_flight.popleft()
+
+def _segments(results):
+    for _, _, future in results:
+        yield from future.result()
+
+def iter_documents(paths, max_workers=None, pages_per_task=PAGES_PER_TASK):
+    """
+    Extracts many files in parallel across processes, splitting large PDFs into page ranges.
+    TXT files are read block by block in this process instead.
+
+    Parameters:
+        paths (list[str]): Files to load.
+        max_workers (int): Worker processes (default: one per core).
+        pages_per_task (int): PDF pages per worker task.
+
+    Yields:
+        tuple: (path, segments), in input order. `segments` yields text as soon as each
+        part of the file has been extracted; it raises if that file failed to load.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    context = multiprocessing.get_context(START_METHOD)
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        results = _iter_results(paths, executor, pages_per_task, lookahead=max_workers * 2)
+        for (_, path), group in groupby(results, key=lambda item: item[:2]):
+            yield path, _segments(group)